@@ -3,33 +3,41 @@ Main Streamlit Application for RAG with Ollama
 """
 
 import streamlit as st
+import html
+import json
 import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
+import queue
+import threading
 import time
 
 # --- Attempt critical imports, fail gracefully if missing ---
+# Heavy modules (document processors, chromadb, the chatbot) are imported
+# inside the functions that need them so the first paint doesn't wait on them.
 try:
-    from src.pdf_processor import PDFProcessor, TXTProcessor, validate_file
-    from src.embeddings import EmbeddingManager, check_ollama_models
-    from src.vector_store import ChromaVectorStore, create_vector_store
-    from src.retrieval_qa import RAGChatbot
     from src.embedding_providers import list_available_providers, test_provider
     from src.utils import (
         check_ollama_status, validate_uploaded_file, save_uploaded_file,
         display_error_message, display_success_message, load_css_style,
         format_file_size, clean_upload_directory
     )
+    from config import CFG
+except Exception as e:
+    st.error(f"❌ Critical import error: {e}")
+    st.stop()
+
+@lru_cache(maxsize=1)
+def get_performance_monitor():
+    """Import the performance monitor on first use; None if unavailable"""
     try:
         from src.performance_monitor import performance_monitor
-        PERFORMANCE_MONITORING_AVAILABLE = True
+        return performance_monitor
     except ImportError as e:
         print(f"Performance monitoring not available: {e}")
-        PERFORMANCE_MONITORING_AVAILABLE = False
-        performance_monitor = None
-    import config
-except Exception as e:
-    st.error(f"❌ Critical import error: {e}")
-    st.stop()
+        return None
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -37,9 +45,9 @@ logger = logging.getLogger(__name__)
 
 # --- Page configuration ---
 st.set_page_config(
-    page_title=getattr(config, "PAGE_TITLE", "RAG Chat with Ollama"),
-    page_icon=getattr(config, "PAGE_ICON", "📚"),
-    layout=getattr(config, "LAYOUT", "wide"),
+    page_title=CFG.PAGE_TITLE,
+    page_icon=CFG.PAGE_ICON,
+    layout=CFG.LAYOUT,
     initial_sidebar_state="expanded"
 )
 
@@ -59,15 +67,44 @@ def initialize_session_state():
         'processed_files': [],
         'ollama_status': None,
         'app_initialized': False,
-        'selected_embedding_provider': config.EMBEDDING_PROVIDER,
-        'chunk_size': config.DEFAULT_CHUNK_SIZE,
-        'chunk_overlap': config.DEFAULT_CHUNK_OVERLAP,
-        'max_tokens': config.DEFAULT_MAX_TOKENS
+        'selected_embedding_provider': CFG.EMBEDDING_PROVIDER,
+        'chunk_size': CFG.DEFAULT_CHUNK_SIZE,
+        'chunk_overlap': CFG.DEFAULT_CHUNK_OVERLAP,
+        'max_tokens': CFG.DEFAULT_MAX_TOKENS,
+        'embed_batch_size': CFG.DEFAULT_EMBED_BATCH_SIZE
     }
     for k, v in defaults.items():
         if k not in st.session_state:
             st.session_state[k] = v
 
+# --- Cached Resources ---
+@st.cache_resource(show_spinner=False)
+def _get_vector_store(provider: str):
+    """Create one vector store per embedding provider, shared across reruns and sessions"""
+    from src.vector_store import create_vector_store
+    return create_vector_store(embedding_provider=provider)
+
+@st.cache_data(ttl=5, show_spinner=False)
+def _cached_collection_info(_vs, generation: int, vs_id: int):
+    """Collection stats, recomputed only after the store changes (or every few seconds)"""
+    return _vs.get_collection_info()
+
+def _collection_info(vs):
+    return _cached_collection_info(vs, vs.generation, id(vs))
+
+# --- Cached Status Probes (reused across reruns instead of re-probing every click) ---
+@st.cache_data(ttl=30, show_spinner=False)
+def _cached_ollama_status():
+    return check_ollama_status()
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _cached_available_providers():
+    return list_available_providers()
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_provider_test(provider: str):
+    return test_provider(provider)
+
 # --- Storage Management Functions ---
 def clear_vector_storage():
     """Clear the vector storage and reset related session state"""
@@ -76,7 +113,12 @@ def clear_vector_storage():
             st.session_state.vector_store.reset_collection()
             st.success("✅ Vector storage cleared successfully!")
 
+        # Drop the cached store so the next run starts with a fresh one
+        _get_vector_store.clear()
+        _cached_collection_info.clear()
+
         # Reset related session state
+        st.session_state.vector_store = None
         st.session_state.chatbot = None
         st.session_state.processed_files = []
         clean_upload_directory()
@@ -92,7 +134,7 @@ def check_startup_clear():
         # Check if there's existing data
         if st.session_state.vector_store:
             try:
-                info = st.session_state.vector_store.get_collection_info()
+                info = _collection_info(st.session_state.vector_store)
                 doc_count = info.get('document_count', 0)
 
                 if doc_count > 0:
@@ -118,7 +160,7 @@ def check_startup_clear():
 # --- Ollama connection check ---
 def check_ollama_connection():
     """Check and display Ollama connection status"""
-    status = check_ollama_status()
+    status = _cached_ollama_status()
     st.session_state.ollama_status = status
 
     if status['status'] == 'running':
@@ -131,17 +173,17 @@ def check_ollama_connection():
         col1, col2 = st.columns(2)
         with col1:
             if text_model_ok:
-                st.success(f"✅ Text model: {config.OLLAMA_MODEL}")
+                st.success(f"✅ Text model: {CFG.OLLAMA_MODEL}")
             else:
-                st.error(f"❌ Text model missing: {config.OLLAMA_MODEL}")
-                st.code(f"ollama pull {config.OLLAMA_MODEL}")
+                st.error(f"❌ Text model missing: {CFG.OLLAMA_MODEL}")
+                st.code(f"ollama pull {CFG.OLLAMA_MODEL}")
 
         with col2:
             if embed_model_ok:
-                st.success(f"✅ Embedding model: {config.OLLAMA_EMBEDDING_MODEL}")
+                st.success(f"✅ Embedding model: {CFG.OLLAMA_EMBEDDING_MODEL}")
             else:
-                st.error(f"❌ Embedding model missing: {config.OLLAMA_EMBEDDING_MODEL}")
-                st.code(f"ollama pull {config.OLLAMA_EMBEDDING_MODEL}")
+                st.error(f"❌ Embedding model missing: {CFG.OLLAMA_EMBEDDING_MODEL}")
+                st.code(f"ollama pull {CFG.OLLAMA_EMBEDDING_MODEL}")
 
         return text_model_ok and embed_model_ok
 
@@ -151,83 +193,86 @@ def check_ollama_connection():
         return False
 
 # --- Chunking Configuration Panel ---
+def _apply_embedding_settings(embed_rec):
+    """Button callback; runs before the sliders are drawn so their keys can be updated"""
+    st.session_state.chunk_size = embed_rec["chunk_size"]
+    st.session_state.chunk_overlap = embed_rec["overlap"]
+
 def chunking_configuration_panel():
     """Advanced chunking configuration with recommendations"""
     with st.sidebar.expander("⚙️ Chunking Settings", expanded=False):
         # Quick presets
         st.subheader("📋 Quick Presets")
-        preset_options = {
-            "Custom": "Custom settings",
-            "pdf_technical": "📄 Technical PDFs",
-            "pdf_general": "📄 General PDFs",
-            "txt_code": "📝 Code/Documentation",
-            "txt_narrative": "📝 Stories/Books",
-            "short_qa": "❓ Q&A/FAQs"
-        }
-
         selected_preset = st.selectbox(
             "Choose preset:",
-            list(preset_options.keys()),
-            format_func=lambda x: preset_options[x],
+            list(CFG.CHUNK_PRESET_LABELS.keys()),
+            format_func=CFG.CHUNK_PRESET_LABELS.get,
             help="Select a preset optimized for your document type"
         )
 
-        # Apply preset if selected
-        if selected_preset != "Custom" and selected_preset in config.CHUNK_RECOMMENDATIONS:
-            preset = config.CHUNK_RECOMMENDATIONS[selected_preset]
-            st.session_state.chunk_size = preset["chunk_size"]
-            st.session_state.chunk_overlap = preset["overlap"]
-            st.session_state.max_tokens = preset["max_tokens"]
-            st.info(f"💡 {preset['description']}")
+        # Apply a preset only when the selection changes, so manual tweaks survive reruns
+        i = CFG.PRESET_IDX.get(selected_preset)
+        if i is not None:
+            if selected_preset != st.session_state.get('last_preset'):
+                st.session_state.chunk_size = CFG.PRESET_CHUNK_SIZES[i]
+                st.session_state.chunk_overlap = CFG.PRESET_OVERLAPS[i]
+                st.session_state.max_tokens = CFG.PRESET_MAX_TOKENS[i]
+            st.info(f"💡 {CFG.PRESET_DESCRIPTIONS[i]}")
+        st.session_state['last_preset'] = selected_preset
 
         # Manual configuration
         st.subheader("🔧 Manual Settings")
 
+        # The sliders are bound to their session state keys, so Streamlit keeps the values
         # Chunk Size
         chunk_size = st.slider(
             "Chunk Size (characters)",
             min_value=200,
             max_value=3000,
-            value=st.session_state.chunk_size,
             step=50,
+            key='chunk_size',
             help="Larger chunks: Better context, slower processing. Smaller chunks: Faster, more precise retrieval."
         )
 
         # Chunk Overlap
         max_overlap = min(chunk_size // 2, 500)
-        chunk_overlap = st.slider(
+        st.session_state.chunk_overlap = min(st.session_state.chunk_overlap, max_overlap)
+        st.slider(
             "Chunk Overlap (characters)",
             min_value=0,
             max_value=max_overlap,
-            value=min(st.session_state.chunk_overlap, max_overlap),
             step=25,
+            key='chunk_overlap',
             help="Overlap ensures important information isn't split between chunks."
         )
 
         # Max Tokens
-        max_tokens = st.slider(
+        st.slider(
             "Max Response Tokens",
             min_value=500,
             max_value=8000,
-            value=st.session_state.max_tokens,
             step=250,
+            key='max_tokens',
             help="Maximum tokens for AI responses. Higher = longer responses, slower generation."
         )
 
-        # Update session state
-        st.session_state.chunk_size = chunk_size
-        st.session_state.chunk_overlap = chunk_overlap
-        st.session_state.max_tokens = max_tokens
+        # Embedding Batch Size
+        st.slider(
+            "Embedding Batch Size (chunks)",
+            min_value=8,
+            max_value=128,
+            step=8,
+            key='embed_batch_size',
+            help="Chunks embedded per request. Larger batches mean fewer round-trips to the embedding provider."
+        )
 
         # Show embedding-specific recommendations
-        if st.session_state.selected_embedding_provider in config.EMBEDDING_RECOMMENDATIONS:
-            embed_rec = config.EMBEDDING_RECOMMENDATIONS[st.session_state.selected_embedding_provider]
+        if st.session_state.selected_embedding_provider in CFG.EMBEDDING_RECOMMENDATIONS:
+            embed_rec = CFG.EMBEDDING_RECOMMENDATIONS[st.session_state.selected_embedding_provider]
             st.info(f"💡 For {st.session_state.selected_embedding_provider}: {embed_rec['description']}")
 
-            if st.button("Apply Embedding Optimized Settings"):
-                st.session_state.chunk_size = embed_rec["chunk_size"]
-                st.session_state.chunk_overlap = embed_rec["overlap"]
-                st.rerun()
+            st.button("Apply Embedding Optimized Settings",
+                      on_click=_apply_embedding_settings, args=(embed_rec,))
 
         # Quick performance indicator
         processing_speed = "🟢 Fast" if chunk_size < 800 else "🟡 Medium" if chunk_size < 1200 else "🔴 Slow"
@@ -238,16 +283,9 @@ def embedding_provider_selection():
     """Allow user to select embedding provider"""
     st.sidebar.header("🔧 Embedding Provider")
 
-    available_providers = list_available_providers()
-    provider_descriptions = {
-        "chromadb_default": "ChromaDB Default (Fast, No Setup)",
-        "ollama": "Ollama (Local, Private)",
-        "openai": "OpenAI (Cloud, High Quality)",
-        "huggingface": "Hugging Face (Local, Open Source)"
-    }
-
+    available_providers = _cached_available_providers()
     # Create display options
-    display_options = [f"{provider} - {provider_descriptions.get(provider, '')}"
+    display_options = [f"{provider} - {CFG.EMBEDDING_PROVIDER_DESCRIPTIONS.get(provider, '')}"
                       for provider in available_providers]
 
     current_index = available_providers.index(st.session_state.selected_embedding_provider)
@@ -265,7 +303,7 @@ def embedding_provider_selection():
     # Test provider status
     if selected_provider != st.session_state.selected_embedding_provider:
         with st.sidebar.spinner(f"Testing {selected_provider}..."):
-            test_result = test_provider(selected_provider)
+            test_result = _cached_provider_test(selected_provider)
 
             if test_result["available"]:
                 st.sidebar.success(f"✅ {selected_provider} is available!")
@@ -284,8 +322,8 @@ def setup_vector_store():
     try:
         if st.session_state.vector_store is None:
             with st.spinner("Initializing vector store..."):
-                st.session_state.vector_store = create_vector_store(
-                    embedding_provider=st.session_state.selected_embedding_provider
+                st.session_state.vector_store = _get_vector_store(
+                    st.session_state.selected_embedding_provider
                 )
             st.success(f"Vector store initialized with {st.session_state.selected_embedding_provider} embeddings!")
         return True
@@ -298,6 +336,8 @@ def setup_chatbot():
     try:
         if st.session_state.chatbot is None and st.session_state.vector_store is not None:
             with st.spinner("Initializing RAG chatbot..."):
+                from src.retrieval_qa import RAGChatbot
+                # One chatbot per session: its memory and stats belong to this user only.
                 # Pass current max_tokens setting to chatbot
                 st.session_state.chatbot = RAGChatbot(
                     st.session_state.vector_store,
@@ -316,7 +356,7 @@ def file_upload_section():
     # Show current document count and clear option
     if st.session_state.vector_store:
         try:
-            info = st.session_state.vector_store.get_collection_info()
+            info = _collection_info(st.session_state.vector_store)
             chunk_count = info.get('document_count', 0)
             file_count = info.get('file_count', 0)
 
@@ -342,10 +382,11 @@ def file_upload_section():
         "Upload documents (PDF or TXT)",
         type=['pdf', 'txt'],
         accept_multiple_files=True,
-        help=f"Supported formats: PDF, TXT | Maximum file size: {config.MAX_FILE_SIZE_MB} MB per file"
+        help=f"Supported formats: PDF, TXT | Maximum file size: {CFG.MAX_FILE_SIZE_MB} MB per file"
     )
 
     if uploaded_files:
+        pending_files = []
         for uploaded_file in uploaded_files:
             # Validate file
             validation = validate_uploaded_file(uploaded_file)
@@ -355,50 +396,211 @@ def file_upload_section():
             if uploaded_file.name in st.session_state.processed_files:
                 st.info(f"📄 {uploaded_file.name} already processed")
                 continue
+            pending_files.append(uploaded_file)
             if st.button(f"Process {uploaded_file.name}", key=f"process_{uploaded_file.name}"):
                 process_uploaded_file(uploaded_file)
 
-def process_uploaded_file(uploaded_file):
+        if len(pending_files) > 1:
+            if st.button(f"Process all {len(pending_files)} files", type="primary", key="process_all"):
+                process_uploaded_files(pending_files)
+
+def _chunk_file(file_path, chunk_size, chunk_overlap):
+    """Extract and chunk a saved file. Touches no Streamlit state, so it can run in a worker thread."""
+    from src.pdf_processor import get_pdf_pipeline, get_txt_pipeline
+
+    file_extension = Path(file_path).suffix.lower()
+
+    if file_extension == '.pdf':
+        return get_pdf_pipeline(chunk_size, chunk_overlap).process_pdf(file_path)
+    elif file_extension == '.txt':
+        return get_txt_pipeline(chunk_size, chunk_overlap).process_txt(file_path)
+    else:
+        raise ValueError(f"Unsupported file type: {file_extension}")
+
+def _chunk_files(saved_files, chunk_size, chunk_overlap):
+    """
+    Chunk several saved files; returns {name: chunks or the exception raised}.
+    PDFs parse in the shared process pool, one per worker, since PyPDF2 holds the GIL;
+    other files are chunked on threads meanwhile.
+    """
+    from src.pdf_processor import get_pdf_pipeline
+
+    pdf_files = [(name, path) for name, path in saved_files if Path(path).suffix.lower() == '.pdf']
+    other_files = [(name, path) for name, path in saved_files if Path(path).suffix.lower() != '.pdf']
+
+    with ThreadPoolExecutor(max_workers=CFG.FILE_PROCESSING_WORKERS) as executor:
+        futures = [
+            (name, executor.submit(_chunk_file, file_path, chunk_size, chunk_overlap))
+            for name, file_path in other_files
+        ]
+        results = {}
+        if pdf_files:
+            pdf_results = get_pdf_pipeline(chunk_size, chunk_overlap).process_many(
+                [path for _, path in pdf_files], return_exceptions=True
+            )
+            results.update(zip((name for name, _ in pdf_files), pdf_results))
+        for name, future in futures:
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = e
+    return results
+
+_EMBED_DONE = object()
+
+def _embed_batches(vector_store, batches, out_queue, stop):
+    """Producer thread: embed batches concurrently and queue them in order. Touches no Streamlit state."""
+    def put(item):
+        # Block on a full queue, but give up if the consumer has gone away
+        while not stop.is_set():
+            try:
+                out_queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        # map() keeps results aligned with the batch index
+        with ThreadPoolExecutor(max_workers=CFG.EMBED_CONCURRENCY) as executor:
+            for batch, embeddings in zip(batches, executor.map(vector_store.embed_documents, batches)):
+                if not put((batch, embeddings)):
+                    return
+    except Exception as e:
+        put(e)
+    put(_EMBED_DONE)
+
+def _embed_and_store(documents, batch_size, name):
+    """Embed in a background thread while this (script) thread writes to the vector store and reports progress"""
+    vector_store = st.session_state.vector_store
+    batches = [documents[i:i + batch_size] for i in range(0, len(documents), batch_size)]
+
+    out_queue = queue.Queue(maxsize=4)
+    stop = threading.Event()
+    producer = threading.Thread(target=_embed_batches, args=(vector_store, batches, out_queue, stop), daemon=True)
+    producer.start()
+
+    ids = []
+    pending_docs, pending_embeddings = [], []
+
+    def flush():
+        # chromadb_default returns no embeddings and embeds inside collection.add
+        embeddings = np.concatenate(pending_embeddings) if pending_embeddings else None
+        ids.extend(vector_store.add_documents(pending_docs, embeddings=embeddings))
+        pending_docs.clear()
+        pending_embeddings.clear()
+
     try:
-        with st.spinner(f"Saving {uploaded_file.name}..."):
-            file_path = save_uploaded_file(uploaded_file)
+        with st.status(f"Embedding {name}...", expanded=True) as status:
+            done = 0
+            while True:
+                item = out_queue.get()
+                if item is _EMBED_DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+
+                batch, embeddings = item
+                pending_docs.extend(batch)
+                if embeddings is not None:
+                    pending_embeddings.append(embeddings)
+                if len(pending_docs) >= CFG.ADD_BATCH_SIZE:
+                    flush()
+
+                done += 1
+                status.update(label=f"Embedding {name}: batch {done}/{len(batches)}")
+
+            if pending_docs:
+                flush()
+            status.update(label=f"Embedded {name} ({len(ids)} chunks)", state="complete", expanded=False)
+    finally:
+        stop.set()
+
+    return ids
+
+def process_uploaded_file(uploaded_file):
+    process_uploaded_files([uploaded_file])
+
+def process_uploaded_files(uploaded_files):
+    """Save, chunk and index uploads; chunking of several files runs concurrently"""
+    from src.pdf_processor import validate_file
+
+    # Use current chunking settings from session state
+    chunk_size = st.session_state.chunk_size
+    chunk_overlap = st.session_state.chunk_overlap
+    batch_size = st.session_state.get('embed_batch_size', CFG.DEFAULT_EMBED_BATCH_SIZE)
+
+    saved_files = []
+    for uploaded_file in uploaded_files:
+        try:
+            with st.spinner(f"Saving {uploaded_file.name}..."):
+                file_path = save_uploaded_file(uploaded_file)
+        except Exception as e:
+            display_error_message(e, f"processing {uploaded_file.name}")
+            continue
 
         # Validate file
         if not validate_file(file_path):
             st.error(f"❌ Invalid file: {uploaded_file.name}")
-            return
-
-        # Determine file type and process accordingly
-        file_extension = uploaded_file.name.lower().split('.')[-1]
-
-        with st.spinner(f"Processing {uploaded_file.name}..."):
-            # Use current chunking settings from session state
-            chunk_size = st.session_state.chunk_size
-            chunk_overlap = st.session_state.chunk_overlap
-
-            if file_extension == 'pdf':
-                processor = PDFProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-                documents = processor.process_pdf(file_path)
-            elif file_extension == 'txt':
-                processor = TXTProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-                documents = processor.process_txt(file_path)
-            else:
-                st.error(f"❌ Unsupported file type: {file_extension}")
-                return
+            continue
+        saved_files.append((uploaded_file.name, file_path))
 
-        st.success(f"✅ Extracted {len(documents)} chunks from {uploaded_file.name}")
+    if not saved_files:
+        return
 
-        if st.session_state.vector_store is not None:
-            with st.spinner("Adding to vector store..."):
-                ids = st.session_state.vector_store.add_documents(documents)
-            st.success(f"✅ Added {len(ids)} document chunks to vector store")
-            st.session_state.processed_files.append(uploaded_file.name)
-            st.session_state.chatbot = None
-            setup_chatbot()
-    except Exception as e:
-        display_error_message(e, f"processing {uploaded_file.name}")
+    with st.spinner(f"Processing {', '.join(name for name, _ in saved_files)}..."):
+        results = _chunk_files(saved_files, chunk_size, chunk_overlap)
+
+    added_any = False
+    for name, _ in saved_files:
+        try:
+            documents = results[name]
+            if isinstance(documents, Exception):
+                raise documents
+            st.success(f"✅ Extracted {len(documents)} chunks from {name}")
+
+            if st.session_state.vector_store is not None:
+                ids = _embed_and_store(documents, batch_size, name)
+                st.success(f"✅ Added {len(ids)} document chunks to vector store")
+                st.session_state.processed_files.append(name)
+                added_any = True
+        except Exception as e:
+            display_error_message(e, f"processing {name}")
+
+    if added_any:
+        st.session_state.chatbot = None
+        setup_chatbot()
 
 # --- Chat Interface ---
+def _render_message_html(message):
+    """Render one chat message as HTML, with sources in a native <details> block"""
+    role = "🧑 You" if message['type'] == 'user' else "🤖 Assistant"
+    # Escape anything the model or documents produced; markdown syntax still renders
+    parts = [f'<div class="chat-history-message">\n\n**{role}**\n\n{html.escape(message["content"], quote=False)}\n']
+    sources = message.get('sources') or []
+    if sources:
+        parts.append(f"<details><summary>📚 Sources ({len(sources)})</summary>")
+        for j, source in enumerate(sources):
+            parts.append(f"<p><b>Source {j+1}:</b></p><pre>{html.escape(source['page_content'])}</pre>")
+            if 'metadata' in source:
+                parts.append(f"<pre>{html.escape(json.dumps(source['metadata'], indent=2, default=str))}</pre>")
+        parts.append("</details>")
+    parts.append("\n</div>\n")
+    return "\n".join(parts)
+
+def _render_history_html(chat_history):
+    """
+    Render the chat history as a single HTML string. Fragments are kept in
+    session state, so each rerun only renders messages appended since the last one.
+    """
+    cache = st.session_state.get('chat_history_html')
+    if cache is None or cache['history_id'] != id(chat_history) or len(cache['parts']) > len(chat_history):
+        cache = {'history_id': id(chat_history), 'parts': []}
+        st.session_state.chat_history_html = cache
+    for message in chat_history[len(cache['parts']):]:
+        cache['parts'].append(_render_message_html(message))
+    return "\n".join(cache['parts'])
+
 def chat_interface():
     st.header("💬 Chat with Documents")
     if not st.session_state.processed_files:
@@ -407,20 +609,9 @@ def chat_interface():
     if st.session_state.chatbot is None:
         st.error("❌ Chatbot not initialized. Please check Ollama connection and try again.")
         return
-    for i, message in enumerate(st.session_state.chat_history):
-        if message['type'] == 'user':
-            with st.chat_message("user"):
-                st.write(message['content'])
-        else:
-            with st.chat_message("assistant"):
-                st.write(message['content'])
-                if 'sources' in message and message['sources']:
-                    with st.expander(f"📚 Sources ({len(message['sources'])})"):
-                        for j, source in enumerate(message['sources']):
-                            st.markdown(f"**Source {j+1}:**")
-                            st.markdown(f"```\n{source['page_content']}\n```")
-                            if 'metadata' in source:
-                                st.json(source['metadata'])
+    # Past turns go out as one markdown element; only the live turn below uses widgets
+    if st.session_state.chat_history:
+        st.markdown(_render_history_html(st.session_state.chat_history), unsafe_allow_html=True)
     # Chat input
     if prompt := st.chat_input("Ask a question about your documents..."):
         st.session_state.chat_history.append({'type': 'user','content': prompt})
@@ -466,6 +657,8 @@ def sidebar_info():
     st.sidebar.header("📊 System Status")
     # Ollama status
     if st.sidebar.button("🔄 Refresh Status"):
+        _cached_ollama_status.clear()
+        _cached_provider_test.clear()
         st.session_state.ollama_status = None
         st.rerun()
     if st.session_state.ollama_status:
@@ -477,7 +670,7 @@ def sidebar_info():
     # Vector store info
     if st.session_state.vector_store:
         try:
-            info = st.session_state.vector_store.get_collection_info()
+            info = _collection_info(st.session_state.vector_store)
             st.sidebar.info(f"📚 Documents: {info.get('document_count', 0)}")
         except:
             st.sidebar.warning("⚠️ Vector store info unavailable")
@@ -497,7 +690,7 @@ def sidebar_info():
     # Show current storage info
     if st.session_state.vector_store:
         try:
-            info = st.session_state.vector_store.get_collection_info()
+            info = _collection_info(st.session_state.vector_store)
             chunk_count = info.get('document_count', 0)
             file_count = info.get('file_count', 0)
 
@@ -533,7 +726,8 @@ def sidebar_info():
             st.rerun()
 
     # Performance monitoring section (if available)
-    if PERFORMANCE_MONITORING_AVAILABLE and performance_monitor:
+    performance_monitor = get_performance_monitor()
+    if performance_monitor:
         st.sidebar.header("📊 Performance")
         if st.sidebar.button("🔄 Refresh Stats"):
             st.rerun()
@@ -563,7 +757,8 @@ def main():
     initialize_session_state()
 
     # Start performance monitoring if available
-    if PERFORMANCE_MONITORING_AVAILABLE and performance_monitor and not performance_monitor.monitoring:
+    performance_monitor = get_performance_monitor()
+    if performance_monitor and not performance_monitor.monitoring:
         performance_monitor.start_monitoring()
 
     st.markdown('<h1 class="main-header">🤖 Smart Document Assistant</h1>', unsafe_allow_html=True)
@@ -579,7 +774,7 @@ def main():
         st.stop()
 
     # Only check Ollama if it's being used for LLM or embeddings
-    if st.session_state.selected_embedding_provider == "ollama" or config.OLLAMA_MODEL:
+    if st.session_state.selected_embedding_provider == "ollama" or CFG.OLLAMA_MODEL:
         ollama_ok = check_ollama_connection()
         if not ollama_ok:
             st.stop()
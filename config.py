@@ -3,6 +3,8 @@ Configuration file for RAG application with Ollama
 """
 
 import os
+import sys
+from dataclasses import make_dataclass
 from pathlib import Path
 
 # =========[ Base Directory Setup ]=========
@@ -29,8 +31,22 @@ EMBEDDING_PROVIDER = "chromadb_default"  # Default to ChromaDB's built-in embedd
 # OpenAI Embeddings Configuration
 OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"  # or "text-embedding-3-large"
 
+# Number of chunks sent to the embedding provider per request
+DEFAULT_EMBED_BATCH_SIZE = 32
+
+# Parallelism for uploads: files chunked at once, embedding batches in flight
+FILE_PROCESSING_WORKERS = 4
+EMBED_CONCURRENCY = 3
+# Processes extracting PDF pages; each gets at least PDF_PAGES_PER_WORKER pages
+PDF_EXTRACT_WORKERS = os.cpu_count() or 1
+PDF_PAGES_PER_WORKER = 4
+# Match the server's OLLAMA_NUM_PARALLEL; more in-flight requests than that just queue up
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+
 # Hugging Face Embeddings Configuration
 HUGGINGFACE_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+HUGGINGFACE_BATCH_SIZE = 64  # Texts per forward pass in SentenceTransformer.encode
+HUGGINGFACE_CACHE_EMBEDDINGS = True  # Reuse embeddings of previously seen chunks across runs
 
 # =========[ Text Processing & Chunking ]=========
 # Default chunk settings (can be overridden in UI)
@@ -43,6 +59,10 @@ CHUNK_SIZE = DEFAULT_CHUNK_SIZE
 CHUNK_OVERLAP = DEFAULT_CHUNK_OVERLAP
 MAX_TOKENS = DEFAULT_MAX_TOKENS
 
+# Strip control characters and collapse whitespace in extracted PDF text before chunking.
+# Off by default: it changes chunk text and offsets, so re-indexed documents would differ
+CLEAN_PDF_TEXT = False
+
 # Recommended settings for different scenarios
 CHUNK_RECOMMENDATIONS = {
     "pdf_technical": {
@@ -77,6 +97,23 @@ CHUNK_RECOMMENDATIONS = {
     }
 }
 
+# Flat preset lookup table: one hash to get the index, then plain tuple indexing
+PRESET_IDX = {name: i for i, name in enumerate(CHUNK_RECOMMENDATIONS)}
+PRESET_CHUNK_SIZES = tuple(p["chunk_size"] for p in CHUNK_RECOMMENDATIONS.values())
+PRESET_OVERLAPS = tuple(p["overlap"] for p in CHUNK_RECOMMENDATIONS.values())
+PRESET_MAX_TOKENS = tuple(p["max_tokens"] for p in CHUNK_RECOMMENDATIONS.values())
+PRESET_DESCRIPTIONS = tuple(p["description"] for p in CHUNK_RECOMMENDATIONS.values())
+
+# Labels for the chunking preset picker in the UI
+CHUNK_PRESET_LABELS = {
+    "Custom": "Custom settings",
+    "pdf_technical": "📄 Technical PDFs",
+    "pdf_general": "📄 General PDFs",
+    "txt_code": "📝 Code/Documentation",
+    "txt_narrative": "📝 Stories/Books",
+    "short_qa": "❓ Q&A/FAQs"
+}
+
 # Embedding provider recommendations
 EMBEDDING_RECOMMENDATIONS = {
     "chromadb_default": {
@@ -101,6 +138,14 @@ EMBEDDING_RECOMMENDATIONS = {
     }
 }
 
+# Descriptions shown in the embedding provider picker
+EMBEDDING_PROVIDER_DESCRIPTIONS = {
+    "chromadb_default": "ChromaDB Default (Fast, No Setup)",
+    "ollama": "Ollama (Local, Private)",
+    "openai": "OpenAI (Cloud, High Quality)",
+    "huggingface": "Hugging Face (Local, Open Source)"
+}
+
 # Summarization template, if used
 SUMMARY_PROMPT_TEMPLATE = (
     "Summarize the following content:\n\n{text}"
@@ -109,6 +154,25 @@ SUMMARY_PROMPT_TEMPLATE = (
 # =========[ Vector Store & Retrieval ]=========
 COLLECTION_NAME = "pdf_documents"
 SIMILARITY_SEARCH_K = 4       # How many top documents to retrieve
+RERANK_MULTIPLIER = 1         # Candidates fetched per kept document for keyword reranking (1 = no over-fetch)
+MMR_FETCH_K = 20              # Nearest chunks considered by similarity_search_mmr
+MMR_LAMBDA = 0.5              # MMR trade-off: 1 = pure relevance, 0 = pure diversity
+USE_VECTORIZED_SEARCH = True  # Exact NumPy top-K for custom embedding providers
+EXACT_SEARCH_MAX_VECTORS = 5000  # chromadb_default collections up to this size are scanned exactly too
+QUANTIZE_EMBEDDINGS = False   # Keep the in-memory search matrix as INT8 (4x smaller)
+HALF_PRECISION_EMBEDDINGS = False  # Keep it as FP16 instead (2x smaller); ignored when quantizing
+ADD_BATCH_SIZE = 5000         # Chunks written per collection.add call (one transaction each)
+INFO_SCAN_PAGE_SIZE = 10000   # Metadata rows fetched per page when counting source files
+SEARCH_CACHE_SIZE = 512       # Recent (query, k) search results reused until the store changes; 0 disables
+QUERY_EMBEDDING_CACHE_SIZE = 2048  # Recent query embeddings reused across searches; 0 disables
+
+# HNSW index parameters (M and construction_ef only apply when a collection is created)
+# None picks a value from the collection size: <100k vectors -> 16/64/40,
+# <1M -> 24/100/100, larger -> 32/128/200 (M / construction_ef / search_ef)
+HNSW_M = None                 # Graph connectivity; higher = better recall, more memory
+HNSW_CONSTRUCTION_EF = None   # Candidate list size while building the graph
+HNSW_SEARCH_EF = None         # Candidate list size at query time (at least 4 * SIMILARITY_SEARCH_K)
+HNSW_BATCH_SIZE = 1000        # Vectors buffered before they are inserted into the graph
 
 # =========[ File Upload & Allowed Types ]=========
 ALLOWED_EXTENSIONS = [".pdf", ".txt"]  # Support PDF and TXT files
@@ -137,4 +201,15 @@ HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY", "")
 # DEFAULT_LANGUAGE = "en"
 # DEBUG_MODE = False
 
+# =========[ Frozen Snapshot ]=========
+# Read-only copy of every setting above, built once at import for the UI's
+# per-rerun lookups. The module attributes remain the source of truth.
+def _snapshot():
+    names = [name for name in globals() if name.isupper()]
+    options = {"slots": True} if sys.version_info >= (3, 10) else {}
+    Config = make_dataclass("Config", names, frozen=True, **options)
+    return Config(**{name: globals()[name] for name in names})
+
+CFG = _snapshot()
+
 # =========[ End of Configuration ]=========
@@ -5,19 +5,22 @@ Setup script for RAG Application with Ollama
 
 import subprocess
 import sys
-import requests
+import urllib.error
+import urllib.request
 from pathlib import Path
 
 def run_command(command, description):
-    """Run a shell command and handle errors"""
+    """Run a command given as an argv list, streaming its output, and handle errors"""
     print(f"\n🔄 {description}...")
     try:
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
-        if result.returncode == 0:
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+        for line in proc.stdout:
+            print(f"   {line}", end="")
+        if proc.wait() == 0:
             print(f"✅ {description} completed successfully")
             return True
         else:
-            print(f"❌ {description} failed: {result.stderr.strip()}")
+            print(f"❌ {description} failed with exit code {proc.returncode}")
             return False
     except Exception as e:
         print(f"❌ Error during {description}: {e}")
@@ -26,8 +29,11 @@ def run_command(command, description):
 def check_ollama_installation():
     """Check if Ollama is installed"""
     print("\n🔍 Checking Ollama installation...")
-    result = subprocess.run("ollama --version", shell=True, capture_output=True, text=True)
-    if result.returncode == 0:
+    try:
+        result = subprocess.run(["ollama", "--version"], capture_output=True, text=True)
+    except FileNotFoundError:
+        result = None
+    if result is not None and result.returncode == 0:
         print(f"✅ Ollama is installed: {result.stdout.strip()}")
         return True
     else:
@@ -39,14 +45,16 @@ def check_ollama_running():
     """Check if Ollama server is running"""
     print("\n🔍 Checking if Ollama server is running...")
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
-        if response.status_code == 200:
-            print("✅ Ollama server is running")
-            return True
-        else:
-            print("❌ Ollama server is not responding")
-            return False
-    except requests.exceptions.ConnectionError:
+        with urllib.request.urlopen("http://localhost:11434/api/tags", timeout=5) as response:
+            if response.status == 200:
+                print("✅ Ollama server is running")
+                return True
+        print("❌ Ollama server is not responding")
+        return False
+    except urllib.error.HTTPError:
+        print("❌ Ollama server is not responding")
+        return False
+    except urllib.error.URLError:
         print("❌ Cannot connect to Ollama server")
         print("Please start Ollama: ollama serve")
         return False
@@ -54,19 +62,33 @@ def check_ollama_running():
         print(f"❌ Error checking Ollama server: {e}")
         return False
 
-def pull_required_models():
-    """Pull required Ollama models"""
+def pull_required_models(sequential=False):
+    """Pull required Ollama models, all at once unless sequential is set"""
     models = ["llama3.1:latest", "nomic-embed-text"]
-    for model in models:
-        print(f"\n🔄 Pulling model: {model}")
-        print("This may take several minutes depending on your internet connection...")
-        result = subprocess.run(f"ollama pull {model}", shell=True)
-        if result.returncode == 0:
+    if sequential:
+        for model in models:
+            print(f"\n🔄 Pulling model: {model}")
+            print("This may take several minutes depending on your internet connection...")
+            result = subprocess.run(["ollama", "pull", model])
+            if result.returncode == 0:
+                print(f"✅ Successfully pulled {model}")
+            else:
+                print(f"❌ Failed to pull {model}")
+                return False
+        return True
+
+    print(f"\n🔄 Pulling models in parallel: {', '.join(models)}")
+    print("This may take several minutes depending on your internet connection...")
+    print("(Use --sequential to pull one model at a time on slow connections)")
+    procs = {model: subprocess.Popen(["ollama", "pull", model]) for model in models}
+    success = True
+    for model, proc in procs.items():
+        if proc.wait() == 0:
             print(f"✅ Successfully pulled {model}")
         else:
             print(f"❌ Failed to pull {model}")
-            return False
-    return True
+            success = False
+    return success
 
 def install_python_dependencies():
     """Install Python dependencies"""
@@ -76,15 +98,9 @@ def install_python_dependencies():
         print("❌ requirements.txt not found")
         return False
     # Upgrade pip and install
-    subprocess.run([sys.executable, "-m", "pip", "install", "--upgrade", "pip"], capture_output=True, text=True)
-    result = subprocess.run([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"],
-                            capture_output=True, text=True)
-    if result.returncode == 0:
-        print("✅ Python dependencies installed successfully")
-        return True
-    else:
-        print(f"❌ Failed to install dependencies: {result.stderr.strip()}")
-        return False
+    run_command([sys.executable, "-m", "pip", "install", "--upgrade", "pip"], "Upgrading pip")
+    return run_command([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"],
+                       "Installing requirements")
 
 def create_directories():
     """Create necessary directories"""
@@ -142,7 +158,7 @@ def main():
     print("This step may take a while (several GB of downloads)")
     user_input = input("Do you want to pull the required models now? (y/n): ")
     if user_input.lower() in ['y', 'yes']:
-        if not pull_required_models():
+        if not pull_required_models(sequential="--sequential" in sys.argv):
             print("\n❌ Setup failed: Could not pull required models")
             return False
     else:
@@ -5,23 +5,27 @@ Creates a virtual environment and installs dependencies.
 Checks for core dependencies and Ollama status.
 """
 
+import hashlib
+import platform
 import subprocess
 import sys
 import os
 from pathlib import Path
 
+FINGERPRINT_FILE = ".deps_fingerprint"
+
 def run_command(command, description, cwd=None):
-    """Run a shell command and handle errors"""
+    """Run a command given as an argv list, streaming its output, and handle errors"""
     print(f"\n🔄 {description}...")
     try:
-        result = subprocess.run(command, shell=True, capture_output=True, text=True, cwd=cwd)
-        if result.returncode == 0:
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1, cwd=cwd)
+        for line in proc.stdout:
+            print(f"   {line}", end="")
+        if proc.wait() == 0:
             print(f"✅ {description} completed successfully")
-            if result.stdout.strip():
-                print(f"   Output: {result.stdout.strip()}")
             return True
         else:
-            print(f"❌ {description} failed: {result.stderr}")
+            print(f"❌ {description} failed with exit code {proc.returncode}")
             return False
     except Exception as e:
         print(f"❌ Error during {description}: {e}")
@@ -75,26 +79,42 @@ def get_python_executable(env_name):
     else:
         return f"{env_name}/bin/python"
 
-def install_dependencies(env_name):
-    """Install dependencies in the virtual environment"""
+def requirements_fingerprint():
+    """Hash requirements.txt together with the Python version and platform"""
+    data = Path("requirements.txt").read_bytes() + sys.version.encode() + platform.platform().encode()
+    return hashlib.sha256(data).hexdigest()
+
+def dependencies_up_to_date(env_name, fingerprint):
+    """Check whether the environment was installed from the same requirements and still imports"""
+    fingerprint_path = Path(env_name) / FINGERPRINT_FILE
+    if not fingerprint_path.exists() or fingerprint_path.read_text().strip() != fingerprint:
+        return False
+    python_exe = get_python_executable(env_name)
+    result = subprocess.run([python_exe, "-c", "import streamlit, langchain, chromadb"], capture_output=True, text=True)
+    return result.returncode == 0
+
+def install_dependencies(env_name, force=False):
+    """Install dependencies in the virtual environment, unless requirements are unchanged"""
     print(f"\n🔄 Installing dependencies in virtual environment...")
     python_exe = get_python_executable(env_name)
     # Check if requirements.txt exists
     if not Path("requirements.txt").exists():
         print("❌ requirements.txt not found")
         return False
+    fingerprint = requirements_fingerprint()
+    if not force and dependencies_up_to_date(env_name, fingerprint):
+        print("✅ Dependencies already up to date (use --force to reinstall)")
+        return True
     # Upgrade pip
-    result = subprocess.run([python_exe, "-m", "pip", "install", "--upgrade", "pip"], capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"❌ Failed to upgrade pip: {result.stderr}")
+    if not run_command([python_exe, "-m", "pip", "install", "--upgrade", "pip"], "Upgrading pip"):
         return False
     # Install requirements
-    result = subprocess.run([python_exe, "-m", "pip", "install", "-r", "requirements.txt"], capture_output=True, text=True)
-    if result.returncode == 0:
+    if run_command([python_exe, "-m", "pip", "install", "-r", "requirements.txt"], "Installing requirements"):
+        (Path(env_name) / FINGERPRINT_FILE).write_text(fingerprint)
         print("✅ Dependencies installed successfully")
         return True
     else:
-        print(f"❌ Failed to install dependencies: {result.stderr}")
+        print("❌ Failed to install dependencies")
         return False
 
 def test_installation(env_name):
@@ -198,7 +218,7 @@ def main():
     if not env_name:
         return False
     # Install dependencies
-    if not install_dependencies(env_name):
+    if not install_dependencies(env_name, force="--force" in sys.argv):
         return False
     # Test installation
     if not test_installation(env_name):
@@ -3,10 +3,37 @@ Multiple embedding provider support for the RAG application.
 Supports Ollama, OpenAI, Hugging Face, and ChromaDB default embeddings.
 """
 
+import base64
 import requests
 import config
+import numpy as np
 import os
+from pathlib import Path
 from typing import List, Union
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from src.ollama_client import OLLAMA, embed_legacy, parse_json
+
+
+# Output dimension of well-known embedding models, so callers don't need a probe request
+DIMENSIONS = {
+    "nomic-embed-text": 768,
+    "mxbai-embed-large": 1024,
+    "all-minilm": 384,
+    "snowflake-arctic-embed": 1024,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+    "sentence-transformers/all-MiniLM-L6-v2": 384,
+    "sentence-transformers/all-mpnet-base-v2": 768,
+}
+
+
+def model_dimension(model: str):
+    """Known embedding dimension for a model name, or None"""
+    if model.endswith(":latest"):
+        model = model[:-len(":latest")]
+    return DIMENSIONS.get(model)
 
 
 class BaseEmbeddingProvider:
@@ -16,12 +43,25 @@ class BaseEmbeddingProvider:
         self.name = "base"
         self.dimension = None
     
-    def embed_text(self, texts: Union[str, List[str]]) -> List[List[float]]:
-        """Generate embeddings for text(s). Must be implemented by subclasses."""
+    def embed_text(self, texts: Union[str, List[str]]) -> np.ndarray:
+        """
+        Generate embeddings for text(s) as a float32 array of shape (n, dim).
+        Call .tolist() on the result where plain lists are needed.
+        Must be implemented by subclasses.
+        """
         raise NotImplementedError
     
+    def get_embedding_dimension(self) -> int:
+        """Embedding dimension, from the model table when known, otherwise probed once"""
+        if not self.dimension:
+            self.dimension = len(self.embed_text("x")[0])
+        return self.dimension
+    
     def test_connection(self) -> bool:
-        """Test if the embedding provider is available."""
+        """
+        Test if the embedding provider is available.
+        Subclasses override this with a cheap probe that doesn't generate embeddings.
+        """
         try:
             self.embed_text("test")
             return True
@@ -36,32 +76,75 @@ class OllamaEmbeddingProvider(BaseEmbeddingProvider):
         super().__init__()
         self.name = "ollama"
         self.model = config.OLLAMA_EMBEDDING_MODEL
+        self.dimension = model_dimension(self.model)
         self.base_url = config.OLLAMA_BASE_URL
+        # Set once the server turns out to predate the batched /api/embed endpoint
+        self._legacy_endpoint = False
     
-    def embed_text(self, texts: Union[str, List[str]]) -> List[List[float]]:
-        """Generate embeddings using Ollama"""
+    def embed_text(self, texts: Union[str, List[str]]) -> np.ndarray:
+        """Generate embeddings using Ollama's batched /api/embed endpoint"""
         if isinstance(texts, str):
             texts = [texts]
-        
-        embeddings = []
-        url = f"{self.base_url}/api/embeddings"
-        
-        for text in texts:
-            payload = {"model": self.model, "prompt": text}
-            try:
-                r = requests.post(url, json=payload, timeout=60)
-                r.raise_for_status()
-                data = r.json()
-                
-                if "embedding" in data:
-                    embeddings.append(data["embedding"])
-                else:
-                    raise RuntimeError(f"Embedding error: {data}")
-                    
-            except requests.exceptions.RequestException as e:
-                raise RuntimeError(f"Ollama request error: {e}")
-        
-        return embeddings
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        # Repeated boilerplate (headers, footers) is embedded once and fanned back out
+        unique = list(dict.fromkeys(texts))
+        if len(unique) < len(texts):
+            positions = {text: i for i, text in enumerate(unique)}
+            return self.embed_text(unique)[[positions[text] for text in texts]]
+
+        if self._legacy_endpoint:
+            return self._embed_one_by_one(texts)
+
+        payload = {"model": self.model, "input": texts}
+        try:
+            r = OLLAMA.post(f"{self.base_url}/api/embed", json=payload, timeout=120)
+            if r.status_code == 404 and "model" not in r.text:  # route missing, not model missing
+                self._legacy_endpoint = True
+                return self._embed_one_by_one(texts)
+            r.raise_for_status()
+            data = parse_json(r)
+        except requests.exceptions.RequestException as e:
+            raise RuntimeError(f"Ollama request error: {e}")
+
+        if "embeddings" in data:
+            return np.asarray(data["embeddings"], dtype=np.float32)
+
+        # Older Ollama versions only support one prompt per request
+        return self._embed_one_by_one(texts)
+
+    def test_connection(self) -> bool:
+        """Check that the Ollama server is reachable"""
+        try:
+            return OLLAMA.get(f"{self.base_url}/api/tags", timeout=2).ok
+        except requests.exceptions.RequestException:
+            return False
+    
+    def _embed_one_by_one(self, texts: List[str]) -> np.ndarray:
+        """Generate embeddings concurrently via the legacy per-text /api/embeddings endpoint"""
+        try:
+            embeddings = embed_legacy(self.base_url, self.model, texts, max_workers=config.OLLAMA_NUM_PARALLEL)
+            return np.asarray(embeddings, dtype=np.float32)
+        except requests.exceptions.RequestException as e:
+            raise RuntimeError(f"Ollama request error: {e}")
+
+
+def _create_openai_session():
+    """Keep-alive session for the OpenAI API, retrying rate limits and transient server errors"""
+    session = requests.Session()
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset({"GET", "POST"}),  # Embedding requests are safe to repeat
+    )
+    session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=retry))
+    return session
+
+
+# Shared by all provider instances so TLS connections survive across requests
+_OPENAI_SESSION = _create_openai_session()
 
 
 class OpenAIEmbeddingProvider(BaseEmbeddingProvider):
@@ -71,12 +154,13 @@ class OpenAIEmbeddingProvider(BaseEmbeddingProvider):
         super().__init__()
         self.name = "openai"
         self.model = config.OPENAI_EMBEDDING_MODEL
+        self.dimension = model_dimension(self.model)
         self.api_key = config.OPENAI_API_KEY or os.getenv("OPENAI_API_KEY")
         
         if not self.api_key:
             raise ValueError("OpenAI API key not found. Set OPENAI_API_KEY environment variable.")
     
-    def embed_text(self, texts: Union[str, List[str]]) -> List[List[float]]:
+    def embed_text(self, texts: Union[str, List[str]]) -> np.ndarray:
         """Generate embeddings using OpenAI"""
         if isinstance(texts, str):
             texts = [texts]
@@ -88,24 +172,47 @@ class OpenAIEmbeddingProvider(BaseEmbeddingProvider):
         
         payload = {
             "model": self.model,
-            "input": texts
+            "input": texts,
+            # Raw little-endian float32 bytes: ~4x smaller than JSON floats and no per-float parsing
+            "encoding_format": "base64"
         }
         
         try:
-            r = requests.post(
+            r = _OPENAI_SESSION.post(
                 "https://api.openai.com/v1/embeddings",
                 headers=headers,
                 json=payload,
                 timeout=60
             )
             r.raise_for_status()
-            data = r.json()
+            data = parse_json(r)
             
-            embeddings = [item["embedding"] for item in data["data"]]
-            return embeddings
+            items = sorted(data["data"], key=lambda item: item["index"])
+            return np.stack([
+                np.frombuffer(base64.b64decode(item["embedding"]), dtype="<f4")
+                for item in items
+            ]).astype(np.float32, copy=False)
             
         except requests.exceptions.RequestException as e:
             raise RuntimeError(f"OpenAI request error: {e}")
+    
+    def test_connection(self) -> bool:
+        """Check that the API key is accepted, without spending tokens"""
+        try:
+            r = _OPENAI_SESSION.get(
+                "https://api.openai.com/v1/models",
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=5
+            )
+            return r.ok
+        except requests.exceptions.RequestException:
+            return False
+
+
+# Loaded SentenceTransformer models, keyed by (model name, device)
+_HF_MODELS = {}
+# On-disk embedding caches, one per Hugging Face model
+_HF_CACHES = {}
 
 
 class HuggingFaceEmbeddingProvider(BaseEmbeddingProvider):
@@ -115,6 +222,7 @@ class HuggingFaceEmbeddingProvider(BaseEmbeddingProvider):
         super().__init__()
         self.name = "huggingface"
         self.model_name = config.HUGGINGFACE_EMBEDDING_MODEL
+        self.dimension = model_dimension(self.model_name)
         self._model = None
         self._tokenizer = None
         
@@ -126,19 +234,68 @@ class HuggingFaceEmbeddingProvider(BaseEmbeddingProvider):
             raise ImportError("sentence-transformers not installed. Run: pip install sentence-transformers")
     
     def _load_model(self):
-        """Lazy load the model"""
+        """Lazy load the model, on the GPU in FP16 when CUDA is available"""
         if self._model is None:
-            self._model = self._sentence_transformer(self.model_name)
+            import torch
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            key = (self.model_name, device)
+
+            # Providers are created per request; share the loaded weights across them
+            if key not in _HF_MODELS:
+                model = self._sentence_transformer(self.model_name, device=device)
+                _HF_MODELS[key] = model.half() if device == "cuda" else model
+            self._model = _HF_MODELS[key]
+    
+    def test_connection(self) -> bool:
+        """Check that the model is loaded or downloaded, without running it"""
+        if any(name == self.model_name for name, _ in _HF_MODELS):
+            return True
+        if Path(self.model_name).exists():
+            return True
+        hub_dir = os.getenv("HF_HUB_CACHE") or Path(os.getenv("HF_HOME", Path.home() / ".cache" / "huggingface")) / "hub"
+        return (Path(hub_dir) / f"models--{self.model_name.replace('/', '--')}").exists()
     
-    def embed_text(self, texts: Union[str, List[str]]) -> List[List[float]]:
-        """Generate embeddings using Hugging Face model"""
+    def _get_cache(self):
+        """Persistent cache of this model's embeddings, shared by all provider instances"""
+        from src.embeddings import CacheStore
+        if self.model_name not in _HF_CACHES:
+            cache_dir = Path("cache/hf_embeddings") / self.model_name.replace("/", "__")
+            _HF_CACHES[self.model_name] = CacheStore(cache_dir)
+        return _HF_CACHES[self.model_name]
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Run the model over texts"""
         self._load_model()
-        
+        embeddings = self._model.encode(
+            texts,
+            batch_size=config.HUGGINGFACE_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        return embeddings.astype(np.float32, copy=False)
+    
+    def embed_text(self, texts: Union[str, List[str]]) -> np.ndarray:
+        """Generate embeddings using Hugging Face model, reusing cached results for seen texts"""
         if isinstance(texts, str):
             texts = [texts]
-        
-        embeddings = self._model.encode(texts)
-        return embeddings.tolist()
+        if not config.HUGGINGFACE_CACHE_EMBEDDINGS:
+            return self._encode(texts)
+
+        # Re-embedding unchanged chunks skips tokenization and the forward pass entirely
+        from src.embeddings import cache_key
+        cache = self._get_cache()
+        keys = [cache_key(text, self.model_name) for text in texts]
+        cached = [cache.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if not missing:
+            return np.asarray(cached, dtype=np.float32)
+
+        fresh = self._encode([texts[i] for i in missing])
+        for i, vector in zip(missing, fresh):
+            cache.put_async(keys[i], vector)
+            cached[i] = vector
+        return np.asarray(cached, dtype=np.float32)
 
 
 class ChromaDBDefaultEmbeddingProvider(BaseEmbeddingProvider):
@@ -148,7 +305,7 @@ class ChromaDBDefaultEmbeddingProvider(BaseEmbeddingProvider):
         super().__init__()
         self.name = "chromadb_default"
     
-    def embed_text(self, texts: Union[str, List[str]]) -> List[List[float]]:
+    def embed_text(self, texts: Union[str, List[str]]) -> np.ndarray:
         """ChromaDB handles embeddings internally, so this is not used"""
         raise NotImplementedError("ChromaDB default provider handles embeddings internally")
 
@@ -1,51 +1,269 @@
 import requests
 import config
+from concurrent.futures import ThreadPoolExecutor
+from src.ollama_client import OLLAMA, embed_legacy, parse_json
+from src.embedding_providers import model_dimension
 import hashlib
-import json
+import atexit
+import numpy as np
 import os
+import queue
+import shutil
+import sqlite3
+import threading
 from pathlib import Path
 
+# Optional fast, SIMD-accelerated hashing for cache keys
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+# Identifies how cache keys are derived; a cache built with another scheme is discarded
+CACHE_KEY_SCHEME = "xxh3_128" if XXHASH_AVAILABLE else "md5"
+
+def cache_key(text, model):
+    """Hash text and model name into an embedding cache key"""
+    # Feed "model:" and the text separately; same digest as hashing the joined string
+    h = xxhash.xxh3_128() if XXHASH_AVAILABLE else hashlib.md5()
+    h.update(f"{model}:".encode())
+    h.update(text.encode())
+    return h.hexdigest()
+
+# Cache writes queued by CacheStore.put_async, drained by one background thread
+_WRITE_Q = queue.Queue()
+WRITE_BATCH_SIZE = 256
+
+def _writer_loop():
+    """Write queued embeddings in batches, one transaction and flush per store per batch"""
+    while True:
+        items = [_WRITE_Q.get()]
+        while len(items) < WRITE_BATCH_SIZE:
+            try:
+                items.append(_WRITE_Q.get_nowait())
+            except queue.Empty:
+                break
+        by_store = {}
+        for store, key, vector in items:
+            by_store.setdefault(store, []).append((key, vector))
+        for store, entries in by_store.items():
+            try:
+                store.put_many(entries)
+            except Exception:
+                pass  # A failed cache write only costs a future cache miss
+        for _ in items:
+            _WRITE_Q.task_done()
+
+threading.Thread(target=_writer_loop, name="embedding-cache-writer", daemon=True).start()
+# Don't lose queued writes when the interpreter exits
+atexit.register(_WRITE_Q.join)
+
+class CacheStore:
+    """
+    Embedding cache kept in one memory-mapped float32 matrix (embeddings.f32)
+    plus a SQLite index mapping cache key -> row. The index is read into a dict
+    once at startup, so lookups are a dict probe plus a row slice. All vectors
+    share the dimension of the first one stored; the matrix file grows by doubling.
+    put_async hands writes to a background thread; queued vectors are served
+    from memory until they reach disk.
+    """
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, cache_dir, key_scheme=CACHE_KEY_SCHEME):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.data_path = self.cache_dir / "embeddings.f32"
+        self.index_path = self.cache_dir / "index.sqlite3"
+
+        # Embedding batches run on worker threads, so one lock guards both files
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.index_path), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS emb (k TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value NOT NULL)")
+        self._db.commit()
+
+        self._matrix = None
+        self._rows = {}
+        self._pending = {}
+        self._dim = self._get_meta("dim")
+
+        # Keys hashed with a different function can never hit again, so start over
+        stored_scheme = self._get_meta("key_scheme")
+        if stored_scheme != key_scheme:
+            if stored_scheme is not None or self._dim is not None:
+                self.clear()
+            self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('key_scheme', ?)", (key_scheme,))
+            self._db.commit()
+        self.key_scheme = key_scheme
+
+        # Load the whole key -> row index once; lookups then never touch SQLite
+        self._rows = dict(self._db.execute("SELECT k, row FROM emb"))
+
+    def _get_meta(self, name):
+        row = self._db.execute("SELECT value FROM meta WHERE name=?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _map(self, min_rows):
+        """Return the memmap, remapping if the file grew (possibly via another instance)"""
+        if self._matrix is None or len(self._matrix) < min_rows:
+            self._matrix = None
+            if not self.data_path.exists():
+                return None
+            rows = self.data_path.stat().st_size // (self._dim * 4)
+            if rows < min_rows:
+                return None
+            self._matrix = np.memmap(self.data_path, dtype=np.float32, mode="r+", shape=(rows, self._dim))
+        return self._matrix
+
+    def _ensure_capacity(self, min_rows):
+        """Grow the matrix file so it holds at least min_rows rows"""
+        matrix = self._map(min_rows)
+        if matrix is not None:
+            return matrix
+
+        rows = self.data_path.stat().st_size // (self._dim * 4) if self.data_path.exists() else 0
+        new_rows = max(self.INITIAL_CAPACITY, rows * 2, min_rows)
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        with open(self.data_path, "ab") as f:
+            f.truncate(new_rows * self._dim * 4)
+        return self._map(min_rows)
+
+    def get(self, key):
+        """Return the cached embedding for key as a list, or None"""
+        pending = self._pending.get(key)
+        if pending is not None:
+            return pending.tolist()
+        row = self._rows.get(key)
+        if row is None:
+            return None
+        with self._lock:
+            if self._dim is None:
+                return None
+            matrix = self._map(row + 1)
+            return matrix[row].tolist() if matrix is not None else None
+
+    def put(self, key, embedding):
+        """Store an embedding; vectors with a different dimension than the cache are skipped"""
+        self.put_many([(key, np.asarray(embedding, dtype=np.float32))])
+
+    def put_async(self, key, embedding):
+        """Queue an embedding for the background writer; get() sees it immediately"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        self._pending[key] = vector
+        _WRITE_Q.put((self, key, vector))
+
+    def put_many(self, entries):
+        """Store (key, float32 vector) pairs in one transaction"""
+        with self._lock:
+            try:
+                if self._dim is None and entries:
+                    self._db.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('dim', ?)", (len(entries[0][1]),))
+                    self._db.commit()
+                    self._dim = self._get_meta("dim")
+                valid = [(key, vector) for key, vector in entries if vector.shape == (self._dim,)]
+                if not valid:
+                    return
+
+                written = {}
+                try:
+                    # Take the write lock first so row allocation is safe across connections
+                    self._db.execute("BEGIN IMMEDIATE")
+                    next_row = self._db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM emb").fetchone()[0]
+                    for key, vector in valid:
+                        existing = written.get(key)
+                        if existing is None:
+                            found = self._db.execute("SELECT row FROM emb WHERE k=?", (key,)).fetchone()
+                            existing = found[0] if found else None
+                        if existing is None:
+                            row = next_row
+                            next_row += 1
+                            self._db.execute("INSERT INTO emb (k, row) VALUES (?, ?)", (key, row))
+                        else:
+                            row = existing
+                        # The index insert only becomes visible at commit, after the vector is written
+                        self._ensure_capacity(row + 1)[row] = vector
+                        written[key] = row
+                    self._matrix.flush()
+                    self._db.commit()
+                except Exception:
+                    self._db.rollback()
+                    raise
+                self._rows.update(written)
+            finally:
+                # Drop queued copies that are now on disk (or failed); keep newer re-puts
+                for key, vector in entries:
+                    if self._pending.get(key) is vector:
+                        del self._pending[key]
+
+    def flush(self):
+        """Wait until every queued write has reached disk"""
+        _WRITE_Q.join()
+
+    def clear(self):
+        """Remove every cached embedding"""
+        self.flush()
+        with self._lock:
+            self._matrix = None
+            self._rows.clear()
+            self._db.execute("DELETE FROM emb")
+            self._db.execute("DELETE FROM meta WHERE name = 'dim'")
+            self._db.commit()
+            self._dim = None
+            self.data_path.unlink(missing_ok=True)
+
+    def stats(self):
+        """Number of cached embeddings and on-disk size"""
+        self.flush()
+        # The in-memory index mirrors the emb table, so no COUNT(*) scan is needed
+        entries = len(self._rows)
+        # One directory scan covers the matrix, the index and its WAL files
+        with os.scandir(self.cache_dir) as it:
+            size = sum(entry.stat().st_size for entry in it if entry.is_file())
+        return {"entries": entries, "size_mb": round(size / (1024 * 1024), 2)}
+
+    def close(self):
+        """Flush the matrix and close the index"""
+        self.flush()
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+                self._matrix = None
+            self._db.close()
+
+
 class EmbeddingManager:
     def __init__(self, cache_dir=None):
         """Initialize embedding manager with optional caching"""
         self.cache_dir = cache_dir or Path("cache/embeddings")
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.cache_enabled = True
+        self.cache = CacheStore(self.cache_dir)
+        # Set once the server turns out to predate the batched /api/embed endpoint
+        self._legacy_endpoint = False
 
     def _get_cache_key(self, text, model=None):
         """Generate a cache key for the given text and model"""
-        model = model or config.OLLAMA_EMBEDDING_MODEL
-        content = f"{model}:{text}"
-        return hashlib.md5(content.encode()).hexdigest()
-
-    def _get_cache_path(self, cache_key):
-        """Get the file path for a cache key"""
-        return self.cache_dir / f"{cache_key}.json"
+        return cache_key(text, model or config.OLLAMA_EMBEDDING_MODEL)
 
     def _load_from_cache(self, cache_key):
         """Load embedding from cache if it exists"""
         if not self.cache_enabled:
             return None
-
-        cache_path = self._get_cache_path(cache_key)
-        if cache_path.exists():
-            try:
-                with open(cache_path, 'r') as f:
-                    return json.load(f)
-            except Exception:
-                # If cache is corrupted, remove it
-                cache_path.unlink(missing_ok=True)
-        return None
+        try:
+            return self.cache.get(cache_key)
+        except Exception:
+            return None
 
     def _save_to_cache(self, cache_key, embedding):
         """Save embedding to cache"""
         if not self.cache_enabled:
             return
-
-        cache_path = self._get_cache_path(cache_key)
         try:
-            with open(cache_path, 'w') as f:
-                json.dump(embedding, f)
+            self.cache.put_async(cache_key, embedding)
         except Exception:
             # If we can't save to cache, just continue
             pass
@@ -63,77 +281,87 @@ class EmbeddingManager:
             single_text = False
             text_list = texts
 
-        embeddings = []
-        url = f"{config.OLLAMA_BASE_URL}/api/embeddings"
+        url = f"{config.OLLAMA_BASE_URL}/api/embed"
+        batches = [text_list[i:i + batch_size] for i in range(0, len(text_list), batch_size)]
 
-        # Process in batches to optimize performance
-        for i in range(0, len(text_list), batch_size):
-            batch = text_list[i:i + batch_size]
-            batch_embeddings = self._process_batch(batch, url)
-            embeddings.extend(batch_embeddings)
+        # Several batches: keep up to config.EMBED_CONCURRENCY requests in flight on the shared session
+        if len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=config.EMBED_CONCURRENCY) as executor:
+                results = executor.map(lambda batch: self._process_batch(batch, url), batches)
+                return [embedding for batch_embeddings in results for embedding in batch_embeddings]
 
-        return embeddings
+        return self._process_batch(batches[0], url) if batches else []
 
     def _process_batch(self, batch_texts, url):
         """Process a batch of texts for embeddings"""
         batch_embeddings = []
-        uncached_texts = []
-        uncached_indices = []
+        # Uncached text -> (cache key, indices); repeated boilerplate is embedded once
+        uncached = {}
 
         # First pass: check cache for all texts
         for idx, text in enumerate(batch_texts):
+            if text in uncached:
+                uncached[text][1].append(idx)
+                continue
+
             cache_key = self._get_cache_key(text)
             cached_embedding = self._load_from_cache(cache_key)
 
             if cached_embedding is not None:
                 batch_embeddings.append((idx, cached_embedding))
             else:
-                uncached_texts.append(text)
-                uncached_indices.append(idx)
+                uncached[text] = (cache_key, [idx])
 
-        # Second pass: generate embeddings for uncached texts
-        for i, text in enumerate(uncached_texts):
-            payload = {"model": config.OLLAMA_EMBEDDING_MODEL, "prompt": text}
+        # Second pass: one request for the unique uncached texts, then fan results back out
+        if uncached:
+            new_embeddings = self._request_embeddings(list(uncached), url)
+            for (cache_key, indices), embedding in zip(uncached.values(), new_embeddings):
+                batch_embeddings.extend((idx, embedding) for idx in indices)
+                self._save_to_cache(cache_key, embedding)
+
+        # Sort by original index and return embeddings only
+        batch_embeddings.sort(key=lambda x: x[0])
+        return [embedding for idx, embedding in batch_embeddings]
+
+    def _request_embeddings(self, texts, url):
+        """Embed texts with a single /api/embed call, falling back to per-text requests on old servers"""
+        if not self._legacy_endpoint:
+            payload = {"model": config.OLLAMA_EMBEDDING_MODEL, "input": texts}
             try:
-                r = requests.post(url, json=payload, timeout=60)
-                r.raise_for_status()
-                data = r.json()
-
-                if "embedding" in data:
-                    embedding = data["embedding"]
-                    original_idx = uncached_indices[i]
-                    batch_embeddings.append((original_idx, embedding))
-
-                    # Save to cache
-                    cache_key = self._get_cache_key(text)
-                    self._save_to_cache(cache_key, embedding)
+                r = OLLAMA.post(url, json=payload, timeout=120)
+                if r.status_code == 404 and "model" not in r.text:  # route missing, not model missing
+                    self._legacy_endpoint = True
                 else:
-                    raise RuntimeError(f"Embedding error: {data}")
-
+                    r.raise_for_status()
+                    data = parse_json(r)
+                    if "embeddings" not in data or len(data["embeddings"]) != len(texts):
+                        raise RuntimeError(f"Embedding error: {data}")
+                    return data["embeddings"]
             except requests.exceptions.RequestException as e:
                 raise RuntimeError(f"Request error: {e}")
 
-        # Sort by original index and return embeddings only
-        batch_embeddings.sort(key=lambda x: x[0])
-        return [embedding for idx, embedding in batch_embeddings]
+        return self._request_embeddings_legacy(texts)
+
+    def _request_embeddings_legacy(self, texts):
+        """Embed texts concurrently via the legacy per-text /api/embeddings endpoint"""
+        try:
+            return embed_legacy(config.OLLAMA_BASE_URL, config.OLLAMA_EMBEDDING_MODEL, texts,
+                                max_workers=config.OLLAMA_NUM_PARALLEL)
+        except requests.exceptions.RequestException as e:
+            raise RuntimeError(f"Request error: {e}")
 
     def clear_cache(self):
         """Clear all cached embeddings"""
-        if self.cache_dir.exists():
-            for cache_file in self.cache_dir.glob("*.json"):
-                cache_file.unlink()
+        # Dropping the directory removes the store and any JSON files of the old
+        # one-file-per-embedding format in one go, instead of an unlink per file
+        self.cache.close()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.cache = CacheStore(self.cache_dir)
 
     def get_cache_stats(self):
         """Get cache statistics"""
-        if not self.cache_dir.exists():
-            return {"files": 0, "size_mb": 0}
-
-        cache_files = list(self.cache_dir.glob("*.json"))
-        total_size = sum(f.stat().st_size for f in cache_files)
-        return {
-            "files": len(cache_files),
-            "size_mb": round(total_size / (1024 * 1024), 2)
-        }
+        return self.cache.stats()
 
     def test_embedding(self, text="This is a test sentence."):
         try:
@@ -144,6 +372,9 @@ class EmbeddingManager:
             return False
 
     def get_embedding_dimension(self):
+        dimension = model_dimension(config.OLLAMA_EMBEDDING_MODEL)
+        if dimension:
+            return dimension
         try:
             return len(self.embed_text("test")[0])
         except Exception:
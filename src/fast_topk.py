@@ -0,0 +1,159 @@
+"""
+Top-K selection over similarity scores, and Maximal Marginal Relevance (MMR)
+selection for diverse results.
+Uses Numba-compiled loops (a bounded min-heap for top-K) when numba is
+installed, otherwise falls back to NumPy (argpartition for top-K).
+"""
+
+import numpy as np
+
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+def _mmr_numpy(sim_qd, sim_dd, k, lambda_mult):
+    """Greedy MMR selection (NumPy fallback)"""
+    n = len(sim_qd)
+    k = min(k, n)
+    selected = np.empty(max(k, 0), dtype=np.int64)
+    if k <= 0:
+        return selected
+    chosen = np.zeros(n, dtype=bool)
+    max_sim = np.full(n, -np.inf)
+    for step in range(k):
+        if step == 0:
+            scores = np.where(chosen, -np.inf, sim_qd)
+        else:
+            scores = np.where(chosen, -np.inf, lambda_mult * sim_qd - (1 - lambda_mult) * max_sim)
+        best = int(np.argmax(scores))
+        selected[step] = best
+        chosen[best] = True
+        max_sim = np.maximum(max_sim, sim_dd[:, best])
+    return selected
+
+
+def _topk_numpy(scores, k):
+    """Indices of the k highest scores, best first (NumPy fallback)"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+if NUMBA_AVAILABLE:
+    @numba.njit(cache=True, fastmath=True)
+    def _topk_heap(scores, k):
+        """Single pass over scores keeping the k best in a preallocated min-heap"""
+        n = scores.shape[0]
+        if k > n:
+            k = n
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        idx = np.empty(k, dtype=np.int64)
+        vals = np.empty(k, dtype=scores.dtype)
+        size = 0
+
+        for i in range(n):
+            s = scores[i]
+            if size < k:
+                # Sift the new entry up from the end of the heap
+                j = size
+                size += 1
+                while j > 0:
+                    parent = (j - 1) // 2
+                    if vals[parent] <= s:
+                        break
+                    vals[j] = vals[parent]
+                    idx[j] = idx[parent]
+                    j = parent
+                vals[j] = s
+                idx[j] = i
+            elif s > vals[0]:
+                # Replace the current minimum and sift it down
+                j = 0
+                while True:
+                    child = 2 * j + 1
+                    if child >= k:
+                        break
+                    if child + 1 < k and vals[child + 1] < vals[child]:
+                        child += 1
+                    if vals[child] >= s:
+                        break
+                    vals[j] = vals[child]
+                    idx[j] = idx[child]
+                    j = child
+                vals[j] = s
+                idx[j] = i
+
+        order = np.argsort(-vals)
+        return idx[order]
+
+    @numba.njit(cache=True)
+    def _mmr_loop(sim_qd, sim_dd, k, lambda_mult):
+        """
+        Greedy MMR: each step picks the candidate with the best trade-off between
+        query similarity and its highest similarity to anything already picked,
+        keeping that running maximum per candidate so a step is a single pass
+        """
+        n = sim_qd.shape[0]
+        if k > n:
+            k = n
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        selected = np.empty(k, dtype=np.int64)
+        chosen = np.zeros(n, dtype=np.bool_)
+        max_sim = np.full(n, -np.inf)
+
+        for step in range(k):
+            best = -1
+            best_score = -np.inf
+            for i in range(n):
+                if chosen[i]:
+                    continue
+                if step == 0:
+                    score = sim_qd[i]  # Nothing picked yet, so nothing to be redundant with
+                else:
+                    score = lambda_mult * sim_qd[i] - (1 - lambda_mult) * max_sim[i]
+                if best < 0 or score > best_score:
+                    best = i
+                    best_score = score
+            selected[step] = best
+            chosen[best] = True
+            for i in range(n):
+                if sim_dd[i, best] > max_sim[i]:
+                    max_sim[i] = sim_dd[i, best]
+
+        return selected
+
+    # Compile for both score dtypes now so the first query doesn't pay the JIT cost
+    _topk_heap(np.zeros(16, dtype=np.float32), 2)
+    _topk_heap(np.zeros(16, dtype=np.float64), 2)
+    for _dtype in (np.float32, np.float64):
+        _mmr_loop(np.zeros(4, dtype=_dtype), np.zeros((4, 4), dtype=_dtype), 2, 0.5)
+
+
+def topk(scores, k):
+    """Return indices of the k highest scores as an int64 array, best first"""
+    scores = np.ascontiguousarray(scores)
+    if NUMBA_AVAILABLE and scores.dtype in (np.float32, np.float64):
+        return _topk_heap(scores, k)
+    return _topk_numpy(scores, k)
+
+
+def compute_mmr(sim_qd, sim_dd, k, lambda_mult=0.5):
+    """
+    Return indices of k candidates chosen by Maximal Marginal Relevance, in pick order.
+    sim_qd holds each candidate's similarity to the query, sim_dd their pairwise
+    similarities; lambda_mult=1 is pure relevance, 0 pure diversity.
+    """
+    sim_qd = np.ascontiguousarray(sim_qd)
+    sim_dd = np.ascontiguousarray(sim_dd, dtype=sim_qd.dtype)
+    if NUMBA_AVAILABLE and sim_qd.dtype in (np.float32, np.float64):
+        return _mmr_loop(sim_qd, sim_dd, k, float(lambda_mult))
+    return _mmr_numpy(sim_qd, sim_dd, k, lambda_mult)
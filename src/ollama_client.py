@@ -0,0 +1,80 @@
+"""
+Shared HTTP session for all requests to the Ollama server.
+Keeps connections alive so status checks, embeddings and generation
+don't pay a new TCP handshake on every call.
+"""
+
+import atexit
+import json
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Optional SIMD JSON parser; embedding responses are mostly long float arrays
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Pool sized for concurrent embedding batches plus streaming generation
+OLLAMA_POOL_CONNECTIONS = 10
+OLLAMA_POOL_MAXSIZE = 40
+
+
+def _create_session():
+    """Create a keep-alive session with a connection pool for Ollama"""
+    session = requests.Session()
+    # Retry once if a connection can't be made (e.g. the server just restarted and dropped
+    # pooled sockets); never after a request was sent, since generation isn't idempotent
+    retry = Retry(total=1, connect=1, read=0, status=0, other=0)
+    adapter = HTTPAdapter(pool_connections=OLLAMA_POOL_CONNECTIONS, pool_maxsize=OLLAMA_POOL_MAXSIZE,
+                          max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Process-wide session; module imports are cached, so Streamlit reruns reuse it
+OLLAMA = _create_session()
+atexit.register(OLLAMA.close)
+
+
+def parse_json(response):
+    """Decode a JSON response body, with orjson when installed"""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.loads(response.content)
+        except orjson.JSONDecodeError:
+            pass  # Let requests raise its usual error below
+    return response.json()
+
+
+def loads(data):
+    """Decode one JSON document from bytes, with orjson when installed; raises ValueError if invalid"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def embed_legacy(base_url, model, texts, max_workers=1):
+    """
+    Embed texts through the per-prompt /api/embeddings endpoint of older Ollama
+    servers, with up to max_workers requests in flight on the shared session.
+    Results keep the order of texts.
+    """
+    url = f"{base_url}/api/embeddings"
+
+    def embed_one(text):
+        r = OLLAMA.post(url, json={"model": model, "prompt": text}, timeout=60)
+        r.raise_for_status()
+        data = parse_json(r)
+        if "embedding" not in data:
+            raise RuntimeError(f"Embedding error: {data}")
+        return data["embedding"]
+
+    if max_workers <= 1 or len(texts) <= 1:
+        return [embed_one(text) for text in texts]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(texts))) as executor:
+        return list(executor.map(embed_one, texts))
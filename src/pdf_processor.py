@@ -1,6 +1,217 @@
 from PyPDF2 import PdfReader
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import atexit
+import io
+import mmap
+import multiprocessing
+import os
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
 import config
+from src.text_clean import clean_pages
+
+# Optional native PDF text extraction (PDFium), several times faster than PyPDF2
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
+# PDFium isn't thread-safe; worker processes each get their own copy of the lock
+_PDFIUM_LOCK = threading.Lock()
+
+# Worker processes for page extraction, started on first use and reused across uploads
+_PAGE_POOL = None
+_PAGE_POOL_LOCK = threading.Lock()
+# Set inside pool workers processing whole files, so they don't fan out again
+_IN_POOL_WORKER = False
+
+# PDFs above this are memory-mapped instead of read into RAM
+PDF_MMAP_THRESHOLD_BYTES = 200 * 1024 * 1024
+
+@contextmanager
+def _pdf_stream(file_path):
+    """
+    Yield the PDF as an in-memory stream. PyPDF2 issues many small reads and
+    seeks while parsing, which is far cheaper against memory than a file handle.
+    Very large files are memory-mapped so RAM use stays bounded.
+    """
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size <= PDF_MMAP_THRESHOLD_BYTES:
+            yield io.BytesIO(file.read())
+        else:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield mm
+
+def _get_page_pool():
+    """Return the shared page-extraction process pool"""
+    global _PAGE_POOL
+    with _PAGE_POOL_LOCK:
+        if _PAGE_POOL is None:
+            # spawn, not fork: the app process runs threads (Streamlit, embedding workers)
+            _PAGE_POOL = ProcessPoolExecutor(
+                max_workers=config.PDF_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            atexit.register(_PAGE_POOL.shutdown)
+        return _PAGE_POOL
+
+def _reset_page_pool():
+    """Forget a broken pool; the next use starts a fresh one"""
+    global _PAGE_POOL
+    with _PAGE_POOL_LOCK:
+        _PAGE_POOL = None
+
+def _pdfium_page_count(path):
+    """Number of pages according to PDFium"""
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+def _pdfium_page_texts(path, start, end):
+    """Text of pages [start, end) extracted by PDFium"""
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(path)
+        try:
+            texts = []
+            for i in range(start, end):
+                page = pdf[i]
+                textpage = page.get_textpage()
+                text = textpage.get_text_range()
+                # PDFium ends lines with \r\n; PyPDF2 and text-mode reads give \n
+                if "\r" in text:
+                    text = text.replace("\r\n", "\n").replace("\r", "\n")
+                texts.append(text)
+                textpage.close()
+                page.close()
+            return texts
+        finally:
+            pdf.close()
+
+def _extract_page_range(path, start, end, use_pdfium):
+    """Extract text of pages [start, end) as (page index, text) pairs; runs in a worker process"""
+    if use_pdfium:
+        return list(enumerate(_pdfium_page_texts(path, start, end), start))
+    # PdfReader can't be pickled, so each worker opens the file itself
+    with _pdf_stream(path) as stream:
+        reader = PdfReader(stream)
+        return [(i, reader.pages[i].extract_text()) for i in range(start, end)]
+
+def _extract_in_pool(file_path, page_count, workers, use_pdfium):
+    """Page texts in page order, extracted by the process pool; None if the pool is broken"""
+    step = -(-page_count // workers)
+    try:
+        pool = _get_page_pool()
+        futures = [
+            pool.submit(_extract_page_range, str(file_path), start, min(start + step, page_count), use_pdfium)
+            for start in range(0, page_count, step)
+        ]
+        pages = sorted(pair for future in futures for pair in future.result())
+    except BrokenProcessPool:
+        # Workers couldn't start or died; drop the pool so the caller extracts in-process
+        _reset_page_pool()
+        return None
+    return [text for _, text in pages]
+
+def _page_workers(page_count):
+    """Number of pool workers to split a PDF of page_count pages over"""
+    if _IN_POOL_WORKER:
+        return 1
+    return min(config.PDF_EXTRACT_WORKERS, page_count // config.PDF_PAGES_PER_WORKER)
+
+def _process_one(file_path, chunk_size, chunk_overlap):
+    """Chunk one PDF in a pool worker"""
+    global _IN_POOL_WORKER
+    _IN_POOL_WORKER = True
+    return PDFProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap).process_pdf(file_path)
+
+def _extract_pages(file_path, stream):
+    """
+    Return (page count, page texts in page order). Uses PDFium when installed and
+    PyPDF2 otherwise, or when PDFium rejects the file. Larger PDFs are spread
+    over the process pool.
+    """
+    if PDFIUM_AVAILABLE:
+        try:
+            page_count = _pdfium_page_count(str(file_path))
+            workers = _page_workers(page_count)
+            pages = _extract_in_pool(file_path, page_count, workers, True) if workers > 1 else None
+            if pages is None:
+                pages = _pdfium_page_texts(str(file_path), 0, page_count)
+            return page_count, pages
+        except Exception:
+            pass  # Fall back to PyPDF2, which may still read a file PDFium refuses
+
+    reader = PdfReader(stream)
+    page_count = len(reader.pages)
+    workers = _page_workers(page_count)
+    pages = _extract_in_pool(file_path, page_count, workers, False) if workers > 1 else None
+    if pages is None:
+        # One page at a time, so callers can stream them
+        pages = (page.extract_text() for page in reader.pages)
+    return page_count, pages
+
+class ChunkBuilder:
+    """
+    Incremental form of TextProcessor.create_chunks: text is fed piece by piece
+    and chunks are emitted as soon as they are complete, so a document never
+    has to exist as one string. The chunks equal create_chunks on the
+    concatenation of everything fed.
+    """
+    def __init__(self, source_name, chunk_size, chunk_overlap):
+        self.source_name = source_name
+        self.chunk_size = chunk_size
+        self.stride = chunk_size - chunk_overlap
+        self.file_type = Path(source_name).suffix.lower()
+        self.length = 0       # Characters fed so far
+        self._buffer = ""     # Text from self._offset on; everything before is already emitted
+        self._offset = 0
+        self._next_start = 0
+        self._chunk_id = 0
+
+    def _emit(self):
+        start = self._next_start
+        end = start + self.chunk_size
+        chunk = {
+            "page_content": self._buffer[start - self._offset:end - self._offset],
+            "metadata": {
+                "source": self.source_name,
+                "chunk_id": self._chunk_id,
+                "start_char": start,
+                "end_char": min(end, self.length),
+                "file_type": self.file_type
+            }
+        }
+        self._chunk_id += 1
+        self._next_start += self.stride
+        return chunk
+
+    def feed(self, text):
+        """Append text; returns the chunks it completed"""
+        self._buffer += text
+        self.length += len(text)
+        chunks = []
+        while self._next_start + self.chunk_size <= self.length:
+            chunks.append(self._emit())
+        # Keep only what later chunks (including the overlap) still need
+        self._buffer = self._buffer[self._next_start - self._offset:]
+        self._offset = self._next_start
+        return chunks
+
+    def finalize(self):
+        """Return the trailing, possibly shorter, chunks"""
+        chunks = []
+        while self._next_start < self.length:
+            chunks.append(self._emit())
+        self._buffer = ""
+        self._offset = self._next_start
+        return chunks
 
 class TextProcessor:
     """Base class for text processing"""
@@ -10,32 +221,100 @@ class TextProcessor:
 
     def create_chunks(self, text, source_name):
         """Create chunks from text with metadata"""
-        chunks = []
-        start = 0
-        chunk_id = 0
+        length = len(text)
+        size = self.chunk_size
+        file_type = Path(source_name).suffix.lower()
+        # All windows are known up front, so build them in one comprehension
+        if isinstance(text, str):
+            return [
+                {
+                    "page_content": text[start:start + size],
+                    "metadata": {
+                        "source": source_name,
+                        "chunk_id": chunk_id,
+                        "start_char": start,
+                        "end_char": min(start + size, length),
+                        "file_type": file_type
+                    }
+                }
+                for chunk_id, start in enumerate(range(0, length, size - self.chunk_overlap))
+            ]
+        return list(self.iter_chunks(text, source_name))
+
+    def iter_chunks(self, text, source_name):
+        """
+        Yield chunks one at a time. text is a str, or an ASCII-only bytes buffer
+        such as an mmap, in which case each chunk is decoded as it is sliced.
+        """
+        length = len(text)
+        size = self.chunk_size
+        decode = not isinstance(text, str)
+        file_type = Path(source_name).suffix.lower()
 
-        while start < len(text):
-            end = start + self.chunk_size
+        for chunk_id, start in enumerate(range(0, length, size - self.chunk_overlap)):
+            end = start + size
             chunk_text = text[start:end]
+            if decode:
+                chunk_text = chunk_text.decode("ascii")
 
             # Create document chunk with metadata
-            chunks.append({
+            yield {
                 "page_content": chunk_text,
                 "metadata": {
                     "source": source_name,
                     "chunk_id": chunk_id,
                     "start_char": start,
-                    "end_char": min(end, len(text)),
-                    "file_type": Path(source_name).suffix.lower()
+                    "end_char": min(end, length),
+                    "file_type": file_type
                 }
-            })
+            }
 
-            chunk_id += 1
-            start += self.chunk_size - self.chunk_overlap
-
-        return chunks
+def _join_pages(pages):
+    """Yield pages with "\n" between them, pieces of "\n".join(pages) without building it"""
+    for i, text in enumerate(pages):
+        if i:
+            yield "\n"
+        yield text
 
 class PDFProcessor(TextProcessor):
+    def process_many(self, file_paths, return_exceptions=False):
+        """
+        Chunk several PDFs at once, one file per worker in the shared process pool.
+        Returns one chunk list per path, in order. With return_exceptions, a file
+        that fails yields its exception in place of its chunks instead of raising.
+        """
+        file_paths = [str(path) for path in file_paths]
+        futures = [None] * len(file_paths)
+        if len(file_paths) > 1 and config.PDF_EXTRACT_WORKERS > 1 and not _IN_POOL_WORKER:
+            try:
+                pool = _get_page_pool()
+                futures = [
+                    pool.submit(_process_one, path, self.chunk_size, self.chunk_overlap)
+                    for path in file_paths
+                ]
+            except BrokenProcessPool:
+                _reset_page_pool()
+
+        results = []
+        for path, future in zip(file_paths, futures):
+            try:
+                results.append(self._pool_result(future, path))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    def _pool_result(self, future, file_path):
+        """Chunks from a pool future, or from processing here if there is none or the pool broke"""
+        if future is not None:
+            try:
+                return future.result()
+            except BrokenProcessPool:
+                _reset_page_pool()
+        # In-process, a single file still gets page-level parallelism
+        return self.process_pdf(file_path)
+
     def process_pdf(self, file_path):
         """
         Accepts a file path string and extracts and chunks text from the PDF.
@@ -47,26 +326,26 @@ class PDFProcessor(TextProcessor):
                 file_path = Path(file_path)
 
             # Read the PDF file
-            with open(file_path, 'rb') as file:
-                reader = PdfReader(file)
-                all_text = []
-
-                for page_num, page in enumerate(reader.pages):
-                    text = page.extract_text()
-                    if text.strip():  # Only add non-empty text
-                        all_text.append(text)
-
-                if not all_text:
+            with _pdf_stream(file_path) as stream:
+                page_count, page_texts = _extract_pages(file_path, stream)
+                # Only keep non-empty pages
+                pages = (text for text in page_texts if text.strip())
+
+                # Chunk page by page instead of joining the whole document first, optionally
+                # normalizing the whitespace and stray control characters PyPDF2 leaves behind
+                pieces = clean_pages(pages) if config.CLEAN_PDF_TEXT else _join_pages(pages)
+                builder = ChunkBuilder(str(file_path.name), self.chunk_size, self.chunk_overlap)
+                chunks = []
+                for piece in pieces:
+                    chunks.extend(builder.feed(piece))
+                chunks.extend(builder.finalize())
+
+                if not builder.length:
                     raise ValueError("No text content found in PDF")
 
-                full_text = "\n".join(all_text)
-
-                # Use base class method to create chunks
-                chunks = self.create_chunks(full_text, str(file_path.name))
-
                 # Add PDF-specific metadata
                 for chunk in chunks:
-                    chunk["metadata"]["total_pages"] = len(reader.pages)
+                    chunk["metadata"]["total_pages"] = page_count
 
                 return chunks
 
@@ -74,6 +353,10 @@ class PDFProcessor(TextProcessor):
             raise Exception(f"Error processing PDF {file_path}: {str(e)}")
 
 
+# Block size for scanning mapped text files, and the bytes str.strip() treats as whitespace
+_SCAN_BLOCK_BYTES = 1024 * 1024
+_ASCII_WHITESPACE = b" \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f"
+
 class TXTProcessor(TextProcessor):
     def process_txt(self, file_path):
         """
@@ -85,37 +368,103 @@ class TXTProcessor(TextProcessor):
             if isinstance(file_path, str):
                 file_path = Path(file_path)
 
+            # Plain ASCII files are chunked straight from the mapping, never held as one str
+            chunks = self._chunk_mapped_ascii(file_path)
+            if chunks is not None:
+                return chunks
+
             # Read the text file
-            with open(file_path, 'r', encoding='utf-8') as file:
-                full_text = file.read()
+            full_text, encoding = self._read_text(file_path)
+
+            chunks = self.process_text(full_text, str(file_path.name))
+            for chunk in chunks:
+                chunk["metadata"]["encoding"] = encoding
+
+            return chunks
+
+        except Exception as e:
+            raise Exception(f"Error processing TXT {file_path}: {str(e)}")
+
+    def process_text(self, text, source="inline"):
+        """
+        Chunk text that is already in memory, as process_txt does for a file's
+        contents. Returns a list of document chunks with metadata.
+        """
+        if not text.strip():
+            raise ValueError("No text content found in TXT file")
+
+        # Use base class method to create chunks
+        chunks = self.create_chunks(text, source)
 
-                if not full_text.strip():
-                    raise ValueError("No text content found in TXT file")
+        # Add TXT-specific metadata
+        for chunk in chunks:
+            chunk["metadata"]["total_chars"] = len(text)
 
-                # Use base class method to create chunks
-                chunks = self.create_chunks(full_text, str(file_path.name))
+        return chunks
 
-                # Add TXT-specific metadata
+    def _chunk_mapped_ascii(self, file_path):
+        """
+        Chunk an ASCII file without \r directly from an mmap; byte offsets are
+        then character offsets, so the chunks match the str path exactly.
+        Returns None when the file needs the full decode path instead.
+        """
+        with open(file_path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return None
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm.find(b"\r") != -1:
+                    return None
+                has_content = False
+                for start in range(0, len(mm), _SCAN_BLOCK_BYTES):
+                    block = mm[start:start + _SCAN_BLOCK_BYTES]
+                    if not block.isascii():
+                        return None
+                    if not has_content:
+                        has_content = bool(block.translate(None, _ASCII_WHITESPACE))
+                if not has_content:
+                    return None  # Let the str path raise its usual error
+
+                chunks = self.create_chunks(mm, str(file_path.name))
                 for chunk in chunks:
-                    chunk["metadata"]["total_chars"] = len(full_text)
+                    chunk["metadata"]["total_chars"] = len(mm)
                     chunk["metadata"]["encoding"] = "utf-8"
-
                 return chunks
 
-        except UnicodeDecodeError:
-            # Try with different encoding
-            try:
-                with open(file_path, 'r', encoding='latin-1') as file:
-                    full_text = file.read()
-                    chunks = self.create_chunks(full_text, str(file_path.name))
-                    for chunk in chunks:
-                        chunk["metadata"]["total_chars"] = len(full_text)
-                        chunk["metadata"]["encoding"] = "latin-1"
-                    return chunks
-            except Exception as e:
-                raise Exception(f"Error reading TXT file with different encodings: {str(e)}")
-        except Exception as e:
-            raise Exception(f"Error processing TXT {file_path}: {str(e)}")
+    @staticmethod
+    def _read_text(file_path):
+        """
+        Memory-map the file and decode it straight from the mapping, so the raw
+        bytes are never copied onto the heap. Falls back to latin-1 from the same
+        mapping if the file isn't valid UTF-8. Returns (text, encoding).
+        """
+        with open(file_path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return "", "utf-8"
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                try:
+                    text, encoding = str(mm, 'utf-8'), "utf-8"
+                except UnicodeDecodeError:
+                    text, encoding = str(mm, 'latin-1'), "latin-1"
+
+        # Match text-mode reads, which translate \r\n and \r to \n
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        return text, encoding
+
+@lru_cache(maxsize=32)
+def get_pdf_pipeline(chunk_size, chunk_overlap):
+    """Return a shared PDFProcessor for the given chunking settings"""
+    return PDFProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+@lru_cache(maxsize=32)
+def get_txt_pipeline(chunk_size, chunk_overlap):
+    """Return a shared TXTProcessor for the given chunking settings"""
+    return TXTProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+# Build the processors for the recommended presets up front
+for _preset in config.CHUNK_RECOMMENDATIONS.values():
+    get_pdf_pipeline(_preset["chunk_size"], _preset["overlap"])
+    get_txt_pipeline(_preset["chunk_size"], _preset["overlap"])
 
 def validate_file(file_path):
     """
@@ -146,18 +495,48 @@ def validate_file(file_path):
         print(f"File validation error: {e}")
         return False
 
+# Bytes searched at each end of a PDF for the header and end-of-file markers
+_PDF_MARKER_WINDOW = 1024
+
 def validate_pdf_file(file_path):
     """Validate PDF file specifically"""
     try:
+        # Header and trailer checks read at most 2 KB however large the file, so
+        # non-PDFs are rejected before anything is parsed
         with open(file_path, 'rb') as file:
-            reader = PdfReader(file)
+            head = file.read(_PDF_MARKER_WINDOW)
+            file.seek(max(0, os.fstat(file.fileno()).st_size - _PDF_MARKER_WINDOW))
+            tail = file.read()
+        # Readers accept a little junk before the header, so search the window
+        if b"%PDF-" not in head:
+            print("PDF validation error: Missing %PDF- header")
+            return False
+        # A normal trailer only needs the page count (no text is decoded);
+        # an unusual one also has its first page parsed
+        full_parse = b"%%EOF" not in tail
+
+        if PDFIUM_AVAILABLE:
+            try:
+                if _pdfium_page_count(str(file_path)) == 0:
+                    print("PDF validation error: PDF has no pages")
+                    return False
+                if full_parse:
+                    # Try to extract text from first page
+                    _pdfium_page_texts(str(file_path), 0, 1)
+                return True
+            except Exception:
+                pass  # Let PyPDF2 have a go before rejecting the file
+
+        with _pdf_stream(file_path) as stream:
+            reader = PdfReader(stream)
             if len(reader.pages) == 0:
                 print("PDF validation error: PDF has no pages")
                 return False
 
-            # Try to extract text from first page
-            first_page = reader.pages[0]
-            first_page.extract_text()
+            if full_parse:
+                # Try to extract text from first page
+                first_page = reader.pages[0]
+                first_page.extract_text()
 
         return True
 
@@ -3,6 +3,7 @@ Performance monitoring utilities for the RAG application
 """
 
 import time
+import numpy as np
 import psutil
 import threading
 from collections import deque
@@ -10,9 +11,18 @@ from datetime import datetime, timedelta
 
 
 class PerformanceMonitor:
-    def __init__(self, max_history=100):
+    def __init__(self, max_history=100, embedding_manager=None):
         self.max_history = max_history
-        self.query_history = deque(maxlen=max_history)
+        # Reported in summaries; injected so a summary never builds its own manager
+        self.embedding_manager = embedding_manager
+        # Query log as a ring of parallel arrays, so summaries are vector ops over contiguous memory
+        self._query_ts = np.zeros(max_history)
+        self._query_duration = np.zeros(max_history)
+        self._query_success = np.zeros(max_history, dtype=bool)
+        self._query_info = [None] * max_history  # (query_type, extra fields) per slot
+        self._query_next = 0
+        self._query_count = 0
+        self._query_lock = threading.Lock()
         self.system_metrics = deque(maxlen=max_history)
         self.start_time = time.time()
         self.monitoring = False
@@ -39,13 +49,18 @@ class PerformanceMonitor:
     
     def _monitor_system(self, interval):
         """Monitor system metrics in background"""
+        # Non-blocking cpu_percent reports usage since the previous call; the first one
+        # only sets the baseline, so take it now rather than recording a bogus 0%
+        psutil.cpu_percent(interval=None)
+        time.sleep(min(interval, 1))
         while self.monitoring:
             try:
+                memory = psutil.virtual_memory()  # One /proc/meminfo read for both fields
                 metrics = {
                     'timestamp': time.time(),
-                    'cpu_percent': psutil.cpu_percent(),
-                    'memory_percent': psutil.virtual_memory().percent,
-                    'memory_used_gb': psutil.virtual_memory().used / (1024**3),
+                    'cpu_percent': psutil.cpu_percent(interval=None),
+                    'memory_percent': memory.percent,
+                    'memory_used_gb': memory.used / (1024**3),
                     'disk_usage_percent': psutil.disk_usage('/').percent
                 }
                 self.system_metrics.append(metrics)
@@ -56,14 +71,40 @@ class PerformanceMonitor:
     
     def log_query(self, query_type, duration, success=True, **kwargs):
         """Log a query performance metric"""
-        metric = {
-            'timestamp': time.time(),
-            'query_type': query_type,
-            'duration': duration,
-            'success': success,
-            **kwargs
-        }
-        self.query_history.append(metric)
+        with self._query_lock:
+            slot = self._query_next
+            self._query_ts[slot] = time.time()
+            self._query_duration[slot] = duration
+            self._query_success[slot] = success
+            self._query_info[slot] = (query_type, kwargs)
+            self._query_next = (slot + 1) % self.max_history
+            self._query_count = min(self._query_count + 1, self.max_history)
+    
+    @property
+    def query_history(self):
+        """Logged queries as dicts, oldest first"""
+        with self._query_lock:
+            count = self._query_count
+            first = (self._query_next - count) % self.max_history
+            slots = [(first + i) % self.max_history for i in range(count)]
+            return [
+                {
+                    'timestamp': float(self._query_ts[slot]),
+                    'query_type': self._query_info[slot][0],
+                    'duration': float(self._query_duration[slot]),
+                    'success': bool(self._query_success[slot]),
+                    **self._query_info[slot][1]
+                }
+                for slot in slots
+            ]
+    
+    def _recent_queries(self, seconds):
+        """Durations and success flags of queries logged in the last `seconds`"""
+        with self._query_lock:
+            count = self._query_count
+            # Slot order doesn't matter for the aggregates, so no unrolling of the ring
+            recent = (time.time() - self._query_ts[:count]) < seconds
+            return self._query_duration[:count][recent], self._query_success[:count][recent]
     
     def get_performance_summary(self):
         """Get comprehensive performance summary"""
@@ -71,35 +112,31 @@ class PerformanceMonitor:
         uptime = now - self.start_time
         
         # Query statistics
-        recent_queries = [q for q in self.query_history 
-                         if now - q['timestamp'] < 3600]  # Last hour
+        durations, successes = self._recent_queries(3600)  # Last hour
         
-        query_stats = self._analyze_queries(recent_queries)
+        query_stats = self._analyze_queries(durations, successes)
         system_stats = self._analyze_system_metrics()
         
         return {
             'uptime_hours': round(uptime / 3600, 2),
-            'total_queries': len(self.query_history),
-            'recent_queries_1h': len(recent_queries),
+            'total_queries': self._query_count,
+            'recent_queries_1h': len(durations),
             'query_stats': query_stats,
             'system_stats': system_stats,
             'cache_stats': self._get_cache_stats()
         }
     
-    def _analyze_queries(self, queries):
+    def _analyze_queries(self, durations, successes):
         """Analyze query performance"""
-        if not queries:
+        if not len(durations):
             return {}
         
-        durations = [q['duration'] for q in queries]
-        success_rate = sum(1 for q in queries if q['success']) / len(queries)
-        
         return {
-            'avg_duration': round(sum(durations) / len(durations), 3),
-            'min_duration': round(min(durations), 3),
-            'max_duration': round(max(durations), 3),
-            'success_rate': round(success_rate * 100, 1),
-            'queries_per_minute': round(len(queries) / 60, 2)
+            'avg_duration': round(float(durations.mean()), 3),
+            'min_duration': round(float(durations.min()), 3),
+            'max_duration': round(float(durations.max()), 3),
+            'success_rate': round(float(successes.mean()) * 100, 1),
+            'queries_per_minute': round(len(durations) / 60, 2)
         }
     
     def _analyze_system_metrics(self):
@@ -120,11 +157,11 @@ class PerformanceMonitor:
         }
     
     def _get_cache_stats(self):
-        """Get cache statistics if available"""
+        """Get cache statistics if an embedding manager was provided"""
+        if self.embedding_manager is None:
+            return {}
         try:
-            from src.embeddings import EmbeddingManager
-            em = EmbeddingManager()
-            return em.get_cache_stats()
+            return self.embedding_manager.get_cache_stats()
         except Exception:
             return {}
     
@@ -154,11 +191,10 @@ class PerformanceMonitor:
                 })
         
         # Check query performance
-        recent_queries = [q for q in self.query_history 
-                         if time.time() - q['timestamp'] < 300]  # Last 5 minutes
+        durations, _ = self._recent_queries(300)  # Last 5 minutes
         
-        if recent_queries:
-            avg_duration = sum(q['duration'] for q in recent_queries) / len(recent_queries)
+        if len(durations):
+            avg_duration = float(durations.mean())
             if avg_duration > 10:  # Slow queries
                 alerts.append({
                     'type': 'warning',
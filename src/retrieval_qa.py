@@ -2,9 +2,78 @@ import requests
 import config
 import time
 import re
-import json
 from collections import Counter
+from functools import lru_cache
 from src.embeddings import EmbeddingManager
+from src.ollama_client import OLLAMA, loads
+
+# Words of three or more characters, used for query expansion and reranking
+_TOK = re.compile(r'\b\w{3,}\b')
+
+# Greeting words matched whole, so e.g. "this" or "they" don't count as "hi"/"hey"
+_GREETING = re.compile(r'\b(?:hi|hello|hey|good\s+(?:morning|afternoon|evening))\b', re.IGNORECASE)
+
+# Streamed tokens are handed on in groups: each yield costs the UI a rerender
+STREAM_FLUSH_TOKENS = 16
+STREAM_FLUSH_SECONDS = 0.05
+
+def _word_set(text):
+    """
+    Lowercased word set of text. Matching the original text and lowercasing
+    only the (short) matches avoids a lowered copy of the whole chunk
+    """
+    return frozenset(word.lower() for word in _TOK.findall(text))
+
+@lru_cache(maxsize=4096)
+def _content_tokens(content):
+    """Word set of a chunk; chunks don't change after ingestion, so each is tokenized once"""
+    return _word_set(content)
+
+# Enhanced system prompt for natural responses, split around the context and question
+_ANSWER_PREFIX = """You are a helpful assistant that answers questions based on the provided documents. Be natural, conversational, and concise.
+
+Guidelines:
+- Answer directly and naturally, like you're having a conversation
+- Keep responses short and to the point
+- Only use information from the provided context
+- If you don't know something, just say so simply
+- Don't be overly formal or structured unless needed
+- For simple greetings, respond naturally but guide toward document-related questions
+
+Context from documents:
+"""
+_ANSWER_INFIX = """
+
+Question: """
+_ANSWER_SUFFIX = """
+
+Answer:"""
+_ANSWER_OPTIONS = {
+    "temperature": 0.8,  # More natural, less formal responses
+    "top_p": 0.9,
+    "repeat_penalty": 1.1
+}
+
+# Enhanced summarization prompt, split around the content
+_SUMMARY_PREFIX = """You are an expert document summarizer. Create a comprehensive yet concise summary of the provided content.
+
+INSTRUCTIONS:
+1. Create a well-structured summary with clear sections
+2. Include the main topics, key points, and important details
+3. Use bullet points or numbered lists for clarity
+4. Highlight any actionable items or conclusions
+5. Maintain the original meaning and context
+6. Keep the summary informative but readable
+7. If there are multiple documents, organize by themes or topics
+
+CONTENT TO SUMMARIZE:
+"""
+_SUMMARY_SUFFIX = """
+
+COMPREHENSIVE SUMMARY:"""
+_SUMMARY_OPTIONS = {
+    "temperature": 0.5  # Lower temperature for summaries
+}
 
 class RAGChatbot:
     def __init__(self, vector_store, max_tokens=None):
@@ -14,12 +83,18 @@ class RAGChatbot:
         self.max_memory_items = 10  # Keep last 10 exchanges
         self.max_context_length = 8000  # Maximum context length in characters
         self.max_tokens = max_tokens or config.DEFAULT_MAX_TOKENS
+        self._generate_url = f"{config.OLLAMA_BASE_URL}/api/generate"
         self.performance_stats = {
             "queries": 0,
             "avg_retrieval_time": 0,
             "avg_generation_time": 0,
+            "std_retrieval_time": 0,
+            "std_generation_time": 0,
             "cache_hits": 0
         }
+        # Welford sums of squared deviations, for the standard deviations above
+        self._retrieval_m2 = 0.0
+        self._generation_m2 = 0.0
 
     def chat(self, prompt):
         start_time = time.time()
@@ -37,7 +112,9 @@ class RAGChatbot:
 
         # Use text-based similarity search with optimized query
         retrieval_start = time.time()
-        docs = self.vector_store.similarity_search(optimized_query, k=config.SIMILARITY_SEARCH_K * 2)
+        # Vector similarity already ranks well; only over-fetch when keyword reranking is meant to filter
+        k = config.SIMILARITY_SEARCH_K * max(1, config.RERANK_MULTIPLIER)
+        docs = self.vector_store.similarity_search(optimized_query, k=k)
         retrieval_time = time.time() - retrieval_start
 
         # Re-rank and filter results
@@ -70,9 +147,8 @@ class RAGChatbot:
 
     def _is_simple_greeting(self, query):
         """Check if the query is a simple greeting"""
-        greetings = ['hi', 'hello', 'hey', 'good morning', 'good afternoon', 'good evening']
-        query_lower = query.lower().strip()
-        return any(greeting in query_lower for greeting in greetings) and len(query.split()) <= 3
+        # maxsplit stops splitting long queries after the fourth word
+        return len(query.split(None, 3)) <= 3 and _GREETING.search(query) is not None
 
     def _optimize_query(self, query):
         """Optimize query for better retrieval by expanding key terms"""
@@ -80,7 +156,7 @@ class RAGChatbot:
         stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should'}
 
         # Extract key terms (words longer than 2 characters, not stop words)
-        words = re.findall(r'\b\w{3,}\b', query.lower())
+        words = _TOK.findall(query.lower())
         key_terms = [word for word in words if word not in stop_words]
 
         # If we have key terms, create an expanded query
@@ -95,12 +171,11 @@ class RAGChatbot:
         if not docs:
             return docs
 
-        query_words = set(re.findall(r'\b\w{3,}\b', query.lower()))
+        query_words = _word_set(query)
 
         scored_docs = []
         for doc in docs:
-            content = doc["page_content"].lower()
-            content_words = set(re.findall(r'\b\w{3,}\b', content))
+            content_words = _content_tokens(doc["page_content"])
 
             # Calculate relevance score
             word_overlap = len(query_words.intersection(content_words))
@@ -117,16 +192,20 @@ class RAGChatbot:
 
     def _update_stats(self, retrieval_time, generation_time):
         """Update performance statistics"""
-        self.performance_stats["queries"] += 1
-        queries = self.performance_stats["queries"]
+        stats = self.performance_stats
+        stats["queries"] += 1
+        queries = stats["queries"]
+
+        # Welford's update: numerically stable running mean and variance
+        delta = retrieval_time - stats["avg_retrieval_time"]
+        stats["avg_retrieval_time"] += delta / queries
+        self._retrieval_m2 += delta * (retrieval_time - stats["avg_retrieval_time"])
+        stats["std_retrieval_time"] = (self._retrieval_m2 / queries) ** 0.5
 
-        # Update running averages
-        self.performance_stats["avg_retrieval_time"] = (
-            (self.performance_stats["avg_retrieval_time"] * (queries - 1) + retrieval_time) / queries
-        )
-        self.performance_stats["avg_generation_time"] = (
-            (self.performance_stats["avg_generation_time"] * (queries - 1) + generation_time) / queries
-        )
+        delta = generation_time - stats["avg_generation_time"]
+        stats["avg_generation_time"] += delta / queries
+        self._generation_m2 += delta * (generation_time - stats["avg_generation_time"])
+        stats["std_generation_time"] = (self._generation_m2 / queries) ** 0.5
 
     def _prepare_context(self, docs, prompt):
         """Prepare and optimize context for better responses"""
@@ -152,44 +231,21 @@ class RAGChatbot:
         return context_header + context
 
     def llm_answer(self, prompt, context, stream=False):
-        url = f"{config.OLLAMA_BASE_URL}/api/generate"
-
-        # Enhanced system prompt for natural responses
-        system_prompt = """You are a helpful assistant that answers questions based on the provided documents. Be natural, conversational, and concise.
-
-Guidelines:
-- Answer directly and naturally, like you're having a conversation
-- Keep responses short and to the point
-- Only use information from the provided context
-- If you don't know something, just say so simply
-- Don't be overly formal or structured unless needed
-- For simple greetings, respond naturally but guide toward document-related questions
-
-Context from documents:
-{context}
-
-Question: {question}
-
-Answer:"""
-
-        user_prompt = system_prompt.format(context=context, question=prompt)
+        # Static prompt pieces are joined around the inputs; no template formatting per query
+        user_prompt = _ANSWER_PREFIX + context + _ANSWER_INFIX + prompt + _ANSWER_SUFFIX
         payload = {
             "model": config.OLLAMA_MODEL,
             "prompt": user_prompt,
             "stream": stream,
-            "options": {
-                "num_predict": self.max_tokens,  # Max tokens to generate
-                "temperature": 0.8,  # More natural, less formal responses
-                "top_p": 0.9,
-                "repeat_penalty": 1.1
-            }
+            "options": {"num_predict": self.max_tokens, **_ANSWER_OPTIONS}
         }
+        url = self._generate_url
 
         try:
             if stream:
                 return self._stream_response(url, payload)
             else:
-                r = requests.post(url, json=payload, timeout=90)
+                r = OLLAMA.post(url, json=payload, timeout=90)
                 r.raise_for_status()  # Raise an exception for bad status codes
                 data = r.json()
                 return data.get("response", "[No answer returned]")
@@ -201,24 +257,28 @@ Answer:"""
     def _stream_response(self, url, payload):
         """Handle streaming response from Ollama"""
         try:
-            response = requests.post(url, json=payload, stream=True, timeout=90)
+            response = OLLAMA.post(url, json=payload, stream=True, timeout=90)
             response.raise_for_status()
 
-            full_response = ""
+            buffer = []
+            last_flush = time.monotonic()
             for line in response.iter_lines():
                 if line:
                     try:
-                        data = json.loads(line.decode('utf-8'))
-                        if 'response' in data:
-                            chunk = data['response']
-                            full_response += chunk
-                            yield chunk
-                        if data.get('done', False):
-                            break
-                    except json.JSONDecodeError:
+                        data = loads(line)
+                    except ValueError:
                         continue
-
-            return full_response
+                    if 'response' in data:
+                        buffer.append(data['response'])
+                    if data.get('done', False):
+                        break
+                    if len(buffer) >= STREAM_FLUSH_TOKENS or time.monotonic() - last_flush > STREAM_FLUSH_SECONDS:
+                        yield "".join(buffer)
+                        buffer.clear()
+                        last_flush = time.monotonic()
+
+            if buffer:
+                yield "".join(buffer)
         except Exception as e:
             yield f"Error in streaming: {str(e)}"
 
@@ -229,38 +289,16 @@ Answer:"""
         return self.llm_summarize(context)
 
     def llm_summarize(self, context):
-        url = f"{config.OLLAMA_BASE_URL}/api/generate"
-
-        # Enhanced summarization prompt
-        system_prompt = """You are an expert document summarizer. Create a comprehensive yet concise summary of the provided content.
-
-INSTRUCTIONS:
-1. Create a well-structured summary with clear sections
-2. Include the main topics, key points, and important details
-3. Use bullet points or numbered lists for clarity
-4. Highlight any actionable items or conclusions
-5. Maintain the original meaning and context
-6. Keep the summary informative but readable
-7. If there are multiple documents, organize by themes or topics
-
-CONTENT TO SUMMARIZE:
-{content}
-
-COMPREHENSIVE SUMMARY:"""
-
-        user_prompt = system_prompt.format(content=context)
         payload = {
             "model": config.OLLAMA_MODEL,
-            "prompt": user_prompt,
+            "prompt": _SUMMARY_PREFIX + context + _SUMMARY_SUFFIX,
             "stream": False,  # Disable streaming to get a single JSON response
-            "options": {
-                "num_predict": self.max_tokens,  # Max tokens to generate
-                "temperature": 0.5  # Lower temperature for summaries
-            }
+            "options": {"num_predict": self.max_tokens, **_SUMMARY_OPTIONS}
         }
+        url = self._generate_url
 
         try:
-            r = requests.post(url, json=payload, timeout=90)
+            r = OLLAMA.post(url, json=payload, timeout=90)
             r.raise_for_status()  # Raise an exception for bad status codes
             data = r.json()
             return data.get("response", "[No summary returned]")
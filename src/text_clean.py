@@ -0,0 +1,104 @@
+"""
+Whitespace and control-character cleanup for extracted document text.
+Uses a Numba-compiled byte loop when numba is installed,
+otherwise falls back to equivalent regular expressions.
+"""
+
+import re
+import numpy as np
+
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+_CONTROL_CHARS = re.compile(r"[\x00-\x08\x0b-\x1f\x7f]")
+_LINE_BREAKS = re.compile(r"[ \t]*\n[ \t\n]*")
+_SPACES = re.compile(r"[ \t]+")
+# Every character clean() drops or folds into a whitespace run
+_WHITESPACE_AND_CONTROL = "".join(map(chr, range(0x21))) + "\x7f"
+
+
+def _clean_regex(text):
+    """Pure-Python cleanup, same output as clean_ascii"""
+    text = _CONTROL_CHARS.sub("", text)
+    text = _LINE_BREAKS.sub(lambda m: "\n\n" if m.group().count("\n") > 1 else "\n", text)
+    text = _SPACES.sub(" ", text)
+    return text.strip(" \n")
+
+
+if NUMBA_AVAILABLE:
+    @numba.njit(cache=True)
+    def clean_ascii(buf):
+        """
+        Drop control characters, collapse runs of spaces/tabs to one space and
+        runs of blank lines to a single empty line, and trim both ends.
+        Works on UTF-8 bytes; multi-byte sequences (>= 0x80) pass through untouched.
+        """
+        out = np.empty(buf.shape[0], dtype=np.uint8)
+        j = 0
+        pending_space = False
+        newlines = 0
+
+        for i in range(buf.shape[0]):
+            b = buf[i]
+            if b == 32 or b == 9:
+                pending_space = True
+            elif b == 10:
+                newlines += 1
+            elif b < 32 or b == 127:
+                continue
+            else:
+                if j > 0:
+                    if newlines > 0:
+                        out[j] = 10
+                        j += 1
+                        if newlines > 1:
+                            out[j] = 10
+                            j += 1
+                    elif pending_space:
+                        out[j] = 32
+                        j += 1
+                newlines = 0
+                pending_space = False
+                out[j] = b
+                j += 1
+
+        return out[:j]
+
+    # Compile now so the first document doesn't pay the JIT cost
+    clean_ascii(np.zeros(16, dtype=np.uint8))
+
+
+def clean(text):
+    """Return text with control characters removed and whitespace normalized"""
+    if not NUMBA_AVAILABLE:
+        return _clean_regex(text)
+    buf = np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+    return clean_ascii(buf).tobytes().decode("utf-8")
+
+
+def clean_pages(pages):
+    """
+    Clean texts one at a time, yielding pieces whose concatenation equals
+    clean("\n".join(pages)) without ever building the joined string
+    """
+    newlines = 0  # Newlines in the whitespace run spanning the current page boundary
+    started = False
+    for i, text in enumerate(pages):
+        if i:
+            newlines += 1  # The joining "\n"
+        cleaned = clean(text)
+        if not cleaned:
+            # Nothing but whitespace and control characters; it all joins the run
+            newlines += text.count("\n")
+            continue
+
+        lead = len(text) - len(text.lstrip(_WHITESPACE_AND_CONTROL))
+        newlines += text.count("\n", 0, lead)
+        if started:
+            yield "\n\n" if newlines > 1 else "\n"
+        yield cleaned
+        started = True
+        newlines = text.count("\n", len(text.rstrip(_WHITESPACE_AND_CONTROL)))
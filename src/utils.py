@@ -1,15 +1,17 @@
 # src/utils.py
 
 import os
+import shutil
 import requests
 from pathlib import Path
 import config
+from src.ollama_client import OLLAMA
 
 def check_ollama_status():
     """Check if Ollama is running and required models are available"""
     try:
         # Check if Ollama is running
-        response = requests.get(f"{config.OLLAMA_BASE_URL}/api/tags", timeout=5)
+        response = OLLAMA.get(f"{config.OLLAMA_BASE_URL}/api/tags", timeout=5)
         if response.status_code != 200:
             return {"status": "not_running", "error": "Ollama service not responding"}
 
@@ -49,18 +51,55 @@ def validate_uploaded_file(uploaded_file):
 
     return {"valid": True, "error": ""}
 
+def _copy_upload(uploaded_file, f):
+    """Write an upload to an open file without building an extra copy in Python"""
+    # Disk-backed source: let the kernel copy file to file
+    src_fd = None
+    if hasattr(os, "sendfile"):
+        try:
+            src_fd = uploaded_file.fileno()
+        except (AttributeError, OSError):
+            pass  # In-memory uploads (BytesIO) have no file descriptor
+    if src_fd is not None:
+        f.flush()
+        offset, size = 0, os.fstat(src_fd).st_size
+        while offset < size:
+            sent = os.sendfile(f.fileno(), src_fd, offset, size - offset)
+            if sent == 0:
+                break
+            offset += sent
+        return
+
+    # In-memory source (Streamlit's UploadedFile): write a view of its buffer, no copy
+    if hasattr(uploaded_file, "getbuffer"):
+        buffer = uploaded_file.getbuffer()
+        try:
+            f.write(buffer)
+        finally:
+            if isinstance(buffer, memoryview):
+                buffer.release()  # BytesIO can't be resized while a view is exported
+        return
+
+    # Any other stream: copy in 1 MiB blocks
+    uploaded_file.seek(0)
+    shutil.copyfileobj(uploaded_file, f, length=1024 * 1024)
+
 def save_uploaded_file(uploaded_file):
     """Save uploaded file to the configured upload directory"""
     try:
+        # Fail fast on oversized uploads before touching the disk
+        size = getattr(uploaded_file, "size", None)
+        if size is not None and size > config.MAX_FILE_SIZE_MB * 1024 * 1024:
+            raise ValueError(f"File size exceeds {config.MAX_FILE_SIZE_MB} MB limit")
+
         # Ensure upload directory exists
         config.DATA_DIR.mkdir(parents=True, exist_ok=True)
 
         # Create file path
         file_path = config.DATA_DIR / uploaded_file.name
 
-        # Save the file
         with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+            _copy_upload(uploaded_file, f)
 
         return str(file_path)
     except Exception as e:
@@ -93,6 +132,15 @@ def load_css_style():
         padding-left: 20px;
         padding-right: 20px;
     }
+    .chat-history-message {
+        padding: 0.5rem 1rem;
+        margin-bottom: 0.75rem;
+        border-radius: 0.5rem;
+        background-color: rgba(128, 128, 128, 0.08);
+    }
+    .chat-history-message pre {
+        white-space: pre-wrap;
+    }
     </style>
     """
 
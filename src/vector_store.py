@@ -1,100 +1,662 @@
 import chromadb
+from chromadb.config import Settings
 import config
+import numpy as np
+import sqlite3
+import threading
 import uuid
+from collections import OrderedDict
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
-from src.embedding_providers import get_embedding_provider
+from pathlib import Path
+from src.embedding_providers import get_embedding_provider, list_available_providers
+from src.fast_topk import compute_mmr, topk
+
+# Optional SIMD kernels for the dense similarity scan
+try:
+    import simsimd
+    SIMSIMD_AVAILABLE = True
+except ImportError:
+    SIMSIMD_AVAILABLE = False
+
+
+_CHROMA_VERSION = tuple(int(part) for part in chromadb.__version__.split(".")[:2])
+
+# chromadb before 0.5 only accepts embeddings as nested Python lists
+_CHROMA_ACCEPTS_NUMPY = _CHROMA_VERSION >= (0, 5)
+
+
+def _to_chroma_embeddings(embeddings):
+    """Pass provider arrays to Chroma as-is, or as lists for old chromadb releases"""
+    if embeddings is None or _CHROMA_ACCEPTS_NUMPY:
+        return embeddings
+    return np.asarray(embeddings).tolist()
+
+
+def _validate_queries(query_texts):
+    """Reject non-string or blank queries before they reach the embedder"""
+    for query_text in query_texts:
+        if not isinstance(query_text, str) or not query_text.strip():
+            raise ValueError(f"Query must be a non-empty string, got {query_text!r}")
+
+
+def _copy_docs(docs):
+    """Copies of search results, so a caller editing one can't change a cached entry"""
+    return [{"page_content": doc["page_content"], "metadata": dict(doc["metadata"])} for doc in docs]
+
+def _l2_normalize(embeddings):
+    """Unit-length float32 rows; cosine similarity on them is a plain dot product"""
+    block = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(block, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return block / norms
+
+
+class DenseIndex:
+    """In-memory matrix of L2-normalized embeddings for exact top-K search"""
+
+    # Rows upcast per block when scoring FP16 without SIMD kernels (NumPy has no FP16 BLAS)
+    HALF_SCORE_BLOCK = 8192
+
+    def __init__(self, quantize=False, half=False):
+        # INT8 rows with a per-vector scale use 4x less memory than float32, FP16 rows 2x
+        self.quantize = quantize
+        self.half = half and not quantize
+        self._dtype = np.int8 if quantize else np.float16 if self.half else np.float32
+        self._matrix = np.empty((0, 0), dtype=self._dtype)
+        self._norms = np.empty(0, dtype=np.float32)
+        self._scales = np.empty(0, dtype=np.float32)
+        self._pending = []  # Blocks added since the matrix was last consolidated
+        self.texts = []
+        self.metadatas = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.texts)
+
+    @staticmethod
+    def _quantize(block):
+        """Scale each row so its largest component maps to 127, then round to int8"""
+        peak = np.max(np.abs(block), axis=1, keepdims=True)
+        peak[peak == 0] = 1.0
+        scales = (127.0 / peak).astype(np.float32)
+        return np.round(block * scales).astype(np.int8), scales[:, 0]
+
+    def add(self, embeddings, texts, metadatas, normalized=False):
+        """Normalize (and optionally quantize) embeddings once at insert time"""
+        block = np.asarray(embeddings, dtype=np.float32)
+        if block.size == 0:
+            return
+        if not normalized:
+            block = _l2_normalize(block)
+
+        if self.quantize:
+            block, scales = self._quantize(block)
+            norms = np.linalg.norm(block.astype(np.float32), axis=1)
+            norms[norms == 0] = 1.0
+        else:
+            block = block.astype(self._dtype, copy=False)
+            scales = np.ones(len(block), dtype=np.float32)
+            norms = np.ones(len(block), dtype=np.float32)
+
+        with self._lock:
+            self._pending.append((block, norms, scales))
+            self.texts.extend(texts)
+            self.metadatas.extend(metadatas)
+
+    def _consolidated(self):
+        """Stack pending blocks into the search matrix (one copy per search, not per add)"""
+        with self._lock:
+            if self._pending:
+                blocks, norms, scales = zip(*self._pending)
+                matrices = ([self._matrix] if self._matrix.size else []) + list(blocks)
+                self._matrix = np.ascontiguousarray(np.vstack(matrices), dtype=self._dtype)
+                self._norms = np.concatenate([self._norms, *norms])
+                self._scales = np.concatenate([self._scales, *scales])
+                self._pending = []
+            return self._matrix
+
+    def vectors(self, indices):
+        """Unit-length float32 copies of the given rows"""
+        matrix = self._consolidated()
+        rows = matrix[indices].astype(np.float32)
+        return rows / self._norms[indices, None] if self.quantize else rows
+
+    def search(self, query_embedding, k):
+        """Return row indices of the k most similar vectors, best first"""
+        return self.search_many([query_embedding], k)[0]
+
+    def search_many(self, query_embeddings, k):
+        """search() for several queries, scored together in one pass over the matrix"""
+        matrix = self._consolidated()
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        results = [[] for _ in range(len(queries))]
+        if matrix.size == 0 or k <= 0:
+            return results
+
+        query_norms = np.linalg.norm(queries, axis=1)
+        valid = np.flatnonzero(query_norms)  # Zero queries match nothing
+        if not len(valid):
+            return results
+        queries = queries[valid] / query_norms[valid, None]
+        if self.quantize:
+            queries = self._quantize(queries)[0]
+
+        if SIMSIMD_AVAILABLE:
+            # Fused dot + norm SIMD kernel (f32, f16 or i8) over the contiguous matrix
+            queries = queries.astype(self._dtype, copy=False)
+            scores = 1.0 - np.asarray(simsimd.cdist(queries, matrix, metric="cosine"))
+        elif self.quantize:
+            queries = queries.astype(np.float32)
+            scores = (queries @ matrix.T) / (np.linalg.norm(queries, axis=1, keepdims=True) * self._norms)
+        elif self.half:
+            step = self.HALF_SCORE_BLOCK
+            scores = np.concatenate([
+                queries @ matrix[i:i + step].astype(np.float32).T for i in range(0, len(matrix), step)
+            ], axis=1)
+        else:
+            scores = queries @ matrix.T
+
+        for row, i in zip(scores, valid):
+            results[i] = topk(row, k).tolist()
+        return results
+
+
+# (vector count upper bound, (M, construction_ef, search_ef)); the last tier has no bound
+_HNSW_TIERS = (
+    (100_000, (16, 64, 40)),
+    (1_000_000, (24, 100, 100)),
+    (None, (32, 128, 200)),
+)
+
+
+def hnsw_params(vector_count):
+    """HNSW parameters for a collection of vector_count vectors; set config values win"""
+    for bound, tier in _HNSW_TIERS:
+        if bound is None or vector_count < bound:
+            m, construction_ef, search_ef = tier
+            break
+    search_ef = config.HNSW_SEARCH_EF or max(search_ef, 4 * config.SIMILARITY_SEARCH_K)
+    return {
+        "M": config.HNSW_M or m,
+        "construction_ef": config.HNSW_CONSTRUCTION_EF or construction_ef,
+        "search_ef": search_ef,
+    }
+
+
+class CustomEmbeddingFunction:
+    """
+    ChromaDB embedding function backed by one of our embedding providers,
+    fetched from get_provider on first use
+    """
+
+    def __init__(self, provider_name, get_provider):
+        self._get_provider = get_provider
+        self._provider = None
+        self._lock = threading.Lock()
+        self.name = f"{provider_name}_embeddings"
+
+    @property
+    def provider(self):
+        if self._provider is None:
+            with self._lock:
+                if self._provider is None:
+                    self._provider = self._get_provider()
+        return self._provider
+
+    def __call__(self, input):
+        if isinstance(input, str):
+            input = [input]
+        return _to_chroma_embeddings(self.provider.embed_text(input))
+
+
+# One embedding function per provider name, reused by every store and collection reset
+_EMBEDDING_FUNCTIONS = {}
+_EMBEDDING_FUNCTIONS_LOCK = threading.Lock()
+
+
+def _enable_wal(persist_directory):
+    """
+    Switch Chroma's SQLite store to WAL, so commits append to a log instead of
+    rewriting a rollback journal. The journal mode is stored in the database file
+    and applies to Chroma's own connections; per-connection pragmas would not
+    """
+    try:
+        with closing(sqlite3.connect(str(Path(persist_directory) / "chroma.sqlite3"), timeout=5)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+    except sqlite3.Error as e:
+        print(f"Could not enable WAL mode for ChromaDB: {e}")
+
 
 class ChromaVectorStore:
     def __init__(self, persist_directory=None, embedding_provider=None):
         if persist_directory is None:
             persist_directory = str(config.CHROMA_DB_DIR)
-        self.client = chromadb.PersistentClient(path=persist_directory)
+        self.client = chromadb.PersistentClient(
+            path=persist_directory,
+            settings=Settings(anonymized_telemetry=False, is_persistent=True)
+        )
+        _enable_wal(persist_directory)
+
+        # Chroma's client isn't safe for concurrent writes from several threads
+        self._write_lock = threading.Lock()
+        # Background thread that commits batches, started on the first add
+        self._writer = None
+
+        # Exact in-memory index, loaded from the collection on first search
+        self._dense_index = None
+        # Chroma's built-in model, for embedding chromadb_default queries ourselves
+        self._default_embedder = None
+
+        # Distinct source files and the chunk count they were tallied at, kept current on add
+        self._sources = set()
+        self._sources_count = None
+
+        # Recent query embeddings keyed by query text, least recently used first
+        self._query_embedding_cache = OrderedDict()
+        self._query_embedding_lock = threading.Lock()
+
+        # Recent search results keyed by (query, k, generation), least recently used first
+        self._search_cache = OrderedDict()
+        self._search_cache_lock = threading.Lock()
+
+        # Bumped on every write so callers can cache reads like get_collection_info
+        self._generation = 0
 
-        # Get embedding provider
+        # Embedding provider, loaded on first embed so admin paths never load a model
         self.embedding_provider_name = embedding_provider or config.EMBEDDING_PROVIDER
-        self.embedding_provider = get_embedding_provider(self.embedding_provider_name)
+        if self.embedding_provider_name not in list_available_providers():
+            raise ValueError(
+                f"Unknown embedding provider: {self.embedding_provider_name}. "
+                f"Available: {list_available_providers()}"
+            )
+        self._embedding_provider = None
+        self._provider_lock = threading.Lock()
+
+        # Size the HNSW graph for what is already stored
+        self._open_collection(self._existing_count())
+
+    @property
+    def embedding_provider(self):
+        """The embedding provider, created on first access (embedding threads may race here)"""
+        if self._embedding_provider is None:
+            with self._provider_lock:
+                if self._embedding_provider is None:
+                    self._embedding_provider = get_embedding_provider(self.embedding_provider_name)
+        return self._embedding_provider
+
+    def _existing_count(self):
+        """Vectors in the persisted collection, 0 if it doesn't exist yet"""
+        try:
+            return self.client.get_collection(name=config.COLLECTION_NAME).count()
+        except Exception:
+            return 0
 
-        # Create collection based on embedding provider
+    def _open_collection(self, vector_count=0):
+        """Get or create the collection with HNSW parameters for vector_count vectors"""
+        hnsw = hnsw_params(vector_count)
         if self.embedding_provider_name == "chromadb_default":
             # Use ChromaDB's default embedding function
             self.collection = self.client.get_or_create_collection(
                 name=config.COLLECTION_NAME,
-                metadata={"hnsw:space": "cosine", "embedding_provider": self.embedding_provider_name}
+                metadata=self._collection_metadata(hnsw)
             )
         else:
             # Use custom embedding function
             self.collection = self.client.get_or_create_collection(
                 name=config.COLLECTION_NAME,
                 embedding_function=self._get_embedding_function(),
-                metadata={"hnsw:space": "cosine", "embedding_provider": self.embedding_provider_name}
+                metadata=self._collection_metadata(hnsw)
             )
+        if vector_count:
+            self._tune_search_ef(hnsw["search_ef"])
+
+    def _collection_metadata(self, hnsw):
+        """Distance metric, HNSW tuning and provider tag for a new collection"""
+        return {
+            "hnsw:space": "cosine",
+            "hnsw:M": hnsw["M"],
+            "hnsw:construction_ef": hnsw["construction_ef"],
+            "hnsw:search_ef": hnsw["search_ef"],
+            "hnsw:batch_size": config.HNSW_BATCH_SIZE,
+            "embedding_provider": self.embedding_provider_name
+        }
+
+    def _tune_search_ef(self, search_ef):
+        """
+        Creation metadata is ignored for an existing collection, but its query-time
+        ef can still be changed (chromadb 1.x); older releases keep what they were built with
+        """
+        try:
+            current = self.collection.configuration["hnsw"]["ef_search"]
+            if current != search_ef:
+                self.collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+        except Exception:
+            pass
 
     def _get_embedding_function(self):
-        """Create a custom embedding function for ChromaDB"""
-        class CustomEmbeddingFunction:
-            def __init__(self, provider):
-                self.provider = provider
-                self.name = f"{provider.name}_embeddings"
+        """Shared ChromaDB embedding function for this store's provider"""
+        name = self.embedding_provider_name
+        with _EMBEDDING_FUNCTIONS_LOCK:
+            if name not in _EMBEDDING_FUNCTIONS:
+                # A factory, not this store: the cached function must not keep a store alive
+                _EMBEDDING_FUNCTIONS[name] = CustomEmbeddingFunction(name, lambda: get_embedding_provider(name))
+            return _EMBEDDING_FUNCTIONS[name]
 
-            def __call__(self, input):
-                if isinstance(input, str):
-                    input = [input]
-                return self.provider.embed_text(input)
+    def embed_documents(self, documents):
+        """
+        Compute embeddings for documents with the configured provider.
+        Returns None for chromadb_default, which embeds internally on add.
+        Safe to call from worker threads.
+        """
+        if self.embedding_provider_name == "chromadb_default":
+            return None
+        return self.embedding_provider.embed_text([doc["page_content"] for doc in documents])
 
-        return CustomEmbeddingFunction(self.embedding_provider)
+    def _embed_concurrently(self, documents):
+        """
+        Embed documents in DEFAULT_EMBED_BATCH_SIZE slices with up to
+        EMBED_CONCURRENCY provider requests in flight, keeping document order
+        """
+        size = config.DEFAULT_EMBED_BATCH_SIZE
+        batches = [documents[i:i + size] for i in range(0, len(documents), size)]
+        if len(batches) == 1:
+            return self.embed_documents(documents)
+        with ThreadPoolExecutor(max_workers=min(config.EMBED_CONCURRENCY, len(batches))) as executor:
+            return np.concatenate([np.asarray(e, dtype=np.float32) for e in executor.map(self.embed_documents, batches)])
 
-    def add_documents(self, documents, batch_size=50):
+    def add_documents(self, documents, batch_size=None, embeddings=None):
         """Add documents to the vector store with batch processing"""
         if not documents:
             return []
 
+        # Embed here, outside the write lock, rather than letting Chroma call
+        # the embedding function synchronously inside every collection.add
+        embed = embeddings is None and self.embedding_provider_name != "chromadb_default"
+        if embeddings is not None:
+            # Normalized once here, outside the lock; the cosine index and the dense
+            # index both take them as-is
+            embeddings = _l2_normalize(embeddings)
+
+        # Each batch is a single collection.add call, capped by what the client accepts
+        batch_size = min(batch_size or config.ADD_BATCH_SIZE, self._max_add_batch_size())
         all_ids = []
 
-        # Process documents in batches for better performance
-        for i in range(0, len(documents), batch_size):
-            batch = documents[i:i + batch_size]
-            batch_ids = self._add_document_batch(batch, i)
-            all_ids.extend(batch_ids)
+        # The writer commits batch i while this thread embeds batch i + 1
+        pending = None
+        try:
+            for i in range(0, len(documents), batch_size):
+                batch = documents[i:i + batch_size]
+                if embed:
+                    batch_embeddings = _l2_normalize(self._embed_concurrently(batch))
+                else:
+                    batch_embeddings = embeddings[i:i + batch_size] if embeddings is not None else None
+                if pending is not None:
+                    all_ids.extend(pending.result())
+                pending = self._get_writer().submit(self._write_batch, batch, i, batch_embeddings)
+            all_ids.extend(pending.result())
+        finally:
+            if pending is not None:
+                # On failure a batch may still be in flight; let it land before invalidating
+                if not pending.cancel():
+                    wait([pending])
+                # Earlier batches stay committed even if a later one failed
+                with self._write_lock:
+                    self._generation += 1
+                    self._clear_search_cache()
 
         return all_ids
 
-    def _add_document_batch(self, batch_documents, batch_offset=0):
-        """Add a batch of documents to the vector store"""
+    def _get_writer(self):
+        """
+        Single long-lived thread for collection writes. Chroma serializes writes per
+        collection, so more writers wouldn't help
+        """
+        if self._writer is None:
+            with self._write_lock:
+                if self._writer is None:
+                    self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chroma-writer")
+        return self._writer
+
+    def _write_batch(self, batch_documents, batch_offset, embeddings):
+        """Add one batch under the write lock, from the writer thread"""
+        with self._write_lock:
+            return self._add_document_batch(batch_documents, batch_offset, embeddings)
+
+    def _max_add_batch_size(self):
+        """Largest batch the Chroma client accepts in one add call"""
+        try:
+            return self.client.get_max_batch_size()
+        except AttributeError:  # older chromadb releases
+            return config.ADD_BATCH_SIZE
+
+    def add_documents_batched(self, documents, batch_size=None, embeddings=None):
+        """Add documents in embedding-sized batches (one provider call per batch)"""
+        return self.add_documents(
+            documents,
+            batch_size=batch_size or config.DEFAULT_EMBED_BATCH_SIZE,
+            embeddings=embeddings
+        )
+
+    def _add_document_batch(self, batch_documents, batch_offset=0, embeddings=None):
+        """Add a batch of documents to the vector store, using precomputed embeddings if given"""
         texts = [doc["page_content"] for doc in batch_documents]
         metadatas = [doc["metadata"] for doc in batch_documents]
 
-        # Generate unique IDs using timestamp and UUID
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        ids = [f"{timestamp}_{uuid.uuid4().hex[:8]}_{batch_offset + i}" for i in range(len(texts))]
+        # Generate unique IDs from timestamp, one random token per batch and the position
+        prefix = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}_"
+        ids = [f"{prefix}{batch_offset + i}" for i in range(len(texts))]
 
-        try:
-            self.collection.add(
-                documents=texts,
-                metadatas=metadatas,
-                ids=ids
-            )
-            return ids
-        except Exception as e:
-            raise Exception(f"Error adding document batch to vector store: {str(e)}")
+        if embeddings is not None and len(embeddings) != len(texts):
+            raise ValueError(f"Got {len(embeddings)} embeddings for {len(texts)} documents")
+
+        # Chroma's own exception types propagate, so callers can tell what failed
+        self.collection.add(
+            documents=texts,
+            metadatas=metadatas,
+            embeddings=_to_chroma_embeddings(embeddings),
+            ids=ids
+        )
+        self._update_dense_index(embeddings, texts, metadatas)
+        if self._sources_count is not None:
+            self._sources.update(m["source"] for m in metadatas if m and "source" in m)
+            self._sources_count += len(ids)
+        return ids
+
+    def _use_vectorized_search(self):
+        """
+        Exact NumPy search for custom providers. chromadb_default collections use it
+        while small, where one linear scan beats walking the HNSW graph
+        """
+        if not config.USE_VECTORIZED_SEARCH:
+            return False
+        if self.embedding_provider_name != "chromadb_default":
+            return True
+        if self.collection.count() > config.EXACT_SEARCH_MAX_VECTORS:
+            self._dense_index = None  # Grown past the exact-scan size; free the matrix
+            return False
+        return True
+
+    def _embed_queries(self, query_texts):
+        """
+        Float32 query embeddings, one row per query. Recently embedded queries are
+        reused; unlike search results they stay valid when the store changes.
+        """
+        query_texts = list(query_texts)
+        if config.QUERY_EMBEDDING_CACHE_SIZE <= 0:
+            return self._compute_query_embeddings(query_texts)
+
+        found = {}
+        with self._query_embedding_lock:
+            for query_text in query_texts:
+                embedding = self._query_embedding_cache.get(query_text)
+                if embedding is not None:
+                    self._query_embedding_cache.move_to_end(query_text)
+                    found[query_text] = embedding
+
+        missing = [q for q in dict.fromkeys(query_texts) if q not in found]
+        if missing:
+            embeddings = self._compute_query_embeddings(missing)
+            with self._query_embedding_lock:
+                for query_text, embedding in zip(missing, embeddings):
+                    found[query_text] = self._query_embedding_cache[query_text] = embedding
+                while len(self._query_embedding_cache) > config.QUERY_EMBEDDING_CACHE_SIZE:
+                    self._query_embedding_cache.popitem(last=False)
+        return np.stack([found[query_text] for query_text in query_texts])
+
+    def _compute_query_embeddings(self, query_texts):
+        """Query embeddings from the same model that embedded the stored chunks"""
+        if self.embedding_provider_name != "chromadb_default":
+            return np.asarray(self.embedding_provider.embed_text(query_texts), dtype=np.float32)
+        if self._default_embedder is None:
+            from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+            self._default_embedder = DefaultEmbeddingFunction()
+        return np.asarray(self._default_embedder(query_texts), dtype=np.float32)
+
+    def _update_dense_index(self, embeddings, texts, metadatas):
+        """Keep a loaded dense index in sync with newly added documents"""
+        if self._dense_index is None:
+            return
+        if embeddings is None:
+            # Chroma embedded these itself; reload from the collection on next search
+            self._dense_index = None
+        else:
+            self._dense_index.add(embeddings, texts, [dict(m or {}) for m in metadatas], normalized=True)
+
+    def _get_dense_index(self):
+        """Load all stored embeddings into a DenseIndex once"""
+        if self._dense_index is None:
+            index = DenseIndex(quantize=config.QUANTIZE_EMBEDDINGS, half=config.HALF_PRECISION_EMBEDDINGS)
+            if self.collection.count() > 0:
+                data = self.collection.get(include=["embeddings", "documents", "metadatas"])
+                index.add(data["embeddings"], data["documents"], [m or {} for m in data["metadatas"]])
+            self._dense_index = index
+        return self._dense_index
+
+    def _vectorized_search(self, query_texts, k):
+        """Exact cosine top-K over the in-memory embedding matrix, one embed call for all queries"""
+        index = self._get_dense_index()
+        if not len(index):
+            return [[] for _ in query_texts]
+        query_embeddings = self._embed_queries(query_texts)
+        return [
+            [{"page_content": index.texts[i], "metadata": dict(index.metadatas[i])} for i in hits]
+            for hits in index.search_many(query_embeddings, k)
+        ]
 
     def similarity_search(self, query_text, k=4):
-        """Search for similar documents using query text (not embedding)"""
-        try:
+        """Search for similar documents using query text, reusing recent results"""
+        return self.similarity_search_batch([query_text], k)[0]
+
+    def similarity_search_batch(self, query_texts, k=4):
+        """
+        similarity_search for several queries at once: cached results are reused and
+        the rest are embedded and searched in a single round trip. One list per query.
+        """
+        _validate_queries(query_texts)
+        if config.SEARCH_CACHE_SIZE <= 0:
+            return self._similarity_search(query_texts, k)
+
+        # The generation makes any write invalidate earlier results
+        generation = self._generation
+        found = {}
+        with self._search_cache_lock:
+            for query_text in query_texts:
+                key = (query_text, k, generation)
+                docs = self._search_cache.get(key)
+                if docs is not None:
+                    self._search_cache.move_to_end(key)
+                    found[query_text] = docs
+
+        missing = [q for q in dict.fromkeys(query_texts) if q not in found]
+        if missing:
+            results = self._similarity_search(missing, k)
+            with self._search_cache_lock:
+                for query_text, docs in zip(missing, results):
+                    found[query_text] = self._search_cache[(query_text, k, generation)] = tuple(_copy_docs(docs))
+                while len(self._search_cache) > config.SEARCH_CACHE_SIZE:
+                    self._search_cache.popitem(last=False)
+        return [_copy_docs(found[query_text]) for query_text in query_texts]
+
+    def similarity_search_mmr(self, query_text, k=4, fetch_k=None, lambda_mult=None):
+        """
+        Fetch fetch_k nearest chunks, then keep k of them chosen by Maximal Marginal
+        Relevance so near-duplicate chunks don't crowd out the rest
+        """
+        fetch_k = max(fetch_k or config.MMR_FETCH_K, k)
+        lambda_mult = config.MMR_LAMBDA if lambda_mult is None else lambda_mult
+        _validate_queries([query_text])
+        if self._use_vectorized_search():
+            index = self._get_dense_index()
+            if not len(index):
+                return []
+            query = _l2_normalize(self._embed_queries([query_text])[:1])[0]
+            candidates = index.search(query, fetch_k)
+            vectors = index.vectors(candidates)
+            texts = [index.texts[i] for i in candidates]
+            metadatas = [index.metadatas[i] for i in candidates]
+            sim_qd = vectors @ query
+        else:
             results = self.collection.query(
-                query_texts=[query_text],  # Use query_texts instead of query_embeddings
-                n_results=k
+                query_embeddings=_to_chroma_embeddings(self._embed_queries([query_text])),
+                n_results=fetch_k,
+                include=["documents", "metadatas", "embeddings", "distances"]
             )
+            if not results["documents"] or not results["documents"][0]:
+                return []
+            texts = results["documents"][0]
+            metadatas = results["metadatas"][0] if results["metadatas"] else [None] * len(texts)
+            vectors = _l2_normalize(results["embeddings"][0])
+            sim_qd = 1.0 - np.asarray(results["distances"][0], dtype=np.float32)  # Cosine space
 
-            docs = []
-            if results["documents"] and len(results["documents"]) > 0:
-                for i in range(len(results["documents"][0])):
-                    docs.append({
-                        "page_content": results["documents"][0][i],
-                        "metadata": results["metadatas"][0][i] if results["metadatas"] else {}
-                    })
-            return docs
-        except Exception as e:
-            raise Exception(f"Error searching vector store: {str(e)}")
+        if not len(texts):
+            return []
+        picked = compute_mmr(sim_qd.astype(np.float32), vectors @ vectors.T, k, lambda_mult)
+        return [{"page_content": texts[i], "metadata": dict(metadatas[i] or {})} for i in picked]
+
+    def _clear_search_cache(self):
+        """Drop results of an older generation; the key check alone would only age them out"""
+        with self._search_cache_lock:
+            self._search_cache.clear()
+
+    def _similarity_search(self, query_texts, k):
+        """Search for documents similar to each query text (not embedding)"""
+        if self._use_vectorized_search():
+            return self._vectorized_search(query_texts, k)
+
+        # Embeddings come from the query cache; Chroma traverses the index for the whole batch
+        results = self.collection.query(
+            query_embeddings=_to_chroma_embeddings(self._embed_queries(query_texts)),
+            n_results=k,
+            include=["documents", "metadatas"]  # Distances aren't used
+        )
+
+        if not results["documents"]:
+            return [[] for _ in query_texts]
+        all_metadatas = results["metadatas"] or [None] * len(results["documents"])
+        return [
+            [
+                {"page_content": text, "metadata": metadata or {}}
+                for text, metadata in zip(texts, metadatas or [None] * len(texts))
+            ]
+            for texts, metadatas in zip(results["documents"], all_metadatas)
+        ]
+
+    @property
+    def generation(self):
+        """Counter that changes whenever documents are added or the collection is reset"""
+        return self._generation
+
+    def _scan_sources(self, total_chunks):
+        """Tally distinct sources from metadata only, a page at a time to bound memory"""
+        sources = set()
+        page_size = config.INFO_SCAN_PAGE_SIZE
+        for offset in range(0, total_chunks, page_size):
+            page = self.collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            sources.update(m["source"] for m in page["metadatas"] or () if m and "source" in m)
+        self._sources = sources
+        self._sources_count = total_chunks
 
     def get_collection_info(self):
         """Get collection info including unique file count"""
@@ -105,16 +667,11 @@ class ChromaVectorStore:
             if total_chunks == 0:
                 unique_files = 0
             else:
-                # Get all documents to count unique sources
-                all_docs = self.collection.get()
-                unique_sources = set()
-
-                if all_docs and 'metadatas' in all_docs and all_docs['metadatas']:
-                    for metadata in all_docs['metadatas']:
-                        if metadata and 'source' in metadata:
-                            unique_sources.add(metadata['source'])
-
-                unique_files = len(unique_sources)
+                # The tally follows this store's writes; rescan if another store changed
+                # the collection since, i.e. the chunk count no longer matches
+                if self._sources_count != total_chunks:
+                    self._scan_sources(total_chunks)
+                unique_files = len(self._sources)
 
                 # If we couldn't find any sources, fallback to chunk count
                 if unique_files == 0 and total_chunks > 0:
@@ -122,6 +679,7 @@ class ChromaVectorStore:
 
         except Exception as e:
             print(f"Error getting collection info: {e}")
+            self._sources_count = None
             # Fallback to chunk count if we can't get metadata
             unique_files = total_chunks
 
@@ -140,18 +698,14 @@ class ChromaVectorStore:
             # Collection might not exist, that's fine
             pass
 
+        self._dense_index = None
+        self._sources = set()
+        self._sources_count = 0
+        self._generation += 1
+        self._clear_search_cache()
+
         # Recreate the collection with the same embedding provider
-        if self.embedding_provider_name == "chromadb_default":
-            self.collection = self.client.get_or_create_collection(
-                name=config.COLLECTION_NAME,
-                metadata={"hnsw:space": "cosine", "embedding_provider": self.embedding_provider_name}
-            )
-        else:
-            self.collection = self.client.get_or_create_collection(
-                name=config.COLLECTION_NAME,
-                embedding_function=self._get_embedding_function(),
-                metadata={"hnsw:space": "cosine", "embedding_provider": self.embedding_provider_name}
-            )
+        self._open_collection()
 
 def create_vector_store(embedding_provider=None):
     return ChromaVectorStore(embedding_provider=embedding_provider)
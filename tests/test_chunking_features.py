@@ -4,21 +4,13 @@ Test script to demonstrate the new configurable chunking features
 """
 
 import sys
-import tempfile
-import os
 from pathlib import Path
 
 # Add the current directory to Python path
 sys.path.append('.')
 
-def test_chunking_configurations():
-    """Test different chunking configurations"""
-    print("🧪 Testing configurable chunking features...")
-    
-    from src.pdf_processor import TXTProcessor
-    
-    # Create test content
-    test_content = """
+# Test content, repeated to make it longer
+TEST_CONTENT = """
     This is a comprehensive test document for the RAG application.
     
     Section 1: Introduction
@@ -34,61 +26,173 @@ def test_chunking_configurations():
     This final section covers implementation details and best practices.
     It provides practical guidance for users and developers.
     The information here is structured and sequential.
-    """ * 3  # Repeat to make it longer
+    """ * 3
+
+# Chunking configurations exercised against TEST_CONTENT
+CONFIGURATIONS = [
+    {"name": "Small Chunks", "chunk_size": 200, "overlap": 50},
+    {"name": "Medium Chunks", "chunk_size": 500, "overlap": 100},
+    {"name": "Large Chunks", "chunk_size": 1000, "overlap": 200},
+    {"name": "Technical PDF", "chunk_size": 1200, "overlap": 200},
+    {"name": "Narrative Text", "chunk_size": 600, "overlap": 100},
+]
+
+def test_chunking_configurations():
+    """Test different chunking configurations"""
+    print("🧪 Testing configurable chunking features...")
     
-    # Test different chunking configurations
-    configurations = [
-        {"name": "Small Chunks", "chunk_size": 200, "overlap": 50},
-        {"name": "Medium Chunks", "chunk_size": 500, "overlap": 100},
-        {"name": "Large Chunks", "chunk_size": 1000, "overlap": 200},
-        {"name": "Technical PDF", "chunk_size": 1200, "overlap": 200},
-        {"name": "Narrative Text", "chunk_size": 600, "overlap": 100},
-    ]
+    from src.pdf_processor import get_txt_pipeline
     
-    # Create temporary file
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as tmp_file:
-        tmp_file.write(test_content)
-        tmp_path = tmp_file.name
+    test_content = TEST_CONTENT
     
-    try:
-        print(f"📄 Test document length: {len(test_content)} characters")
-        print("=" * 60)
+    print(f"📄 Test document length: {len(test_content)} characters")
+    print("=" * 60)
+    
+    for config in CONFIGURATIONS:
+        print(f"\n🔧 Testing: {config['name']}")
+        print(f"   Chunk Size: {config['chunk_size']}")
+        print(f"   Overlap: {config['overlap']}")
         
-        for config in configurations:
-            print(f"\n🔧 Testing: {config['name']}")
-            print(f"   Chunk Size: {config['chunk_size']}")
-            print(f"   Overlap: {config['overlap']}")
-            
-            # Create processor with specific settings
-            processor = TXTProcessor(
-                chunk_size=config['chunk_size'],
-                chunk_overlap=config['overlap']
-            )
-            
-            # Process the document
-            documents = processor.process_txt(tmp_path)
-            
-            print(f"   📊 Result: {len(documents)} chunks created")
-            
-            # Show first chunk info
-            if documents:
-                first_chunk = documents[0]
-                chunk_length = len(first_chunk['page_content'])
-                print(f"   📝 First chunk: {chunk_length} characters")
-                print(f"   🏷️  Metadata: {first_chunk['metadata']['chunk_id']}")
-            
-            # Calculate efficiency metrics
-            total_chars = sum(len(doc['page_content']) for doc in documents)
-            efficiency = (total_chars / len(test_content)) * 100
-            print(f"   ⚡ Efficiency: {efficiency:.1f}% (due to overlap)")
-            
-        print("\n" + "=" * 60)
-        print("✅ All chunking configurations tested successfully!")
+        # Reuse the processor built for these settings
+        processor = get_txt_pipeline(config['chunk_size'], config['overlap'])
+        
+        # Process the document straight from memory
+        documents = processor.process_text(test_content, "test_document.txt")
         
-    finally:
-        # Clean up
-        if os.path.exists(tmp_path):
-            os.unlink(tmp_path)
+        print(f"   📊 Result: {len(documents)} chunks created")
+        
+        # Show first chunk info
+        if documents:
+            first_chunk = documents[0]
+            chunk_length = len(first_chunk['page_content'])
+            print(f"   📝 First chunk: {chunk_length} characters")
+            print(f"   🏷️  Metadata: {first_chunk['metadata']['chunk_id']}")
+        
+        # Calculate efficiency metrics
+        total_chars = sum(len(doc['page_content']) for doc in documents)
+        efficiency = (total_chars / len(test_content)) * 100
+        print(f"   ⚡ Efficiency: {efficiency:.1f}% (due to overlap)")
+        
+    print("\n" + "=" * 60)
+    print("✅ All chunking configurations tested successfully!")
+
+def test_text_cleaning():
+    """Test that extracted-text cleanup normalizes whitespace and control characters"""
+    print("🧪 Testing text cleaning...")
+
+    from src.text_clean import clean, _clean_regex
+
+    raw = "  Page\x00 one \t text\r\n\n\n\nnext   line\x0c  \n  café  "
+    expected = "Page one text\n\nnext line\ncafé"
+    assert clean(raw) == expected, f"Unexpected cleaned text: {clean(raw)!r}"
+    assert _clean_regex(raw) == expected, "Fallback cleaner should match"
+    print("✅ Text cleaning works")
+    return True
+
+def test_streaming_chunks():
+    """Test that page-by-page cleaning and chunking matches the joined-document path"""
+    print("🧪 Testing streaming chunk builder...")
+
+    from src.text_clean import clean, clean_pages
+    from src.pdf_processor import ChunkBuilder, TextProcessor
+
+    pages = ["First page \t text  \n", "\x00\n", "  second\x0c page\n\n", "third page " * 40]
+    full_text = clean("\n".join(pages))
+    assert "".join(clean_pages(pages)) == full_text, "Cleaned pages should join to the cleaned document"
+
+    processor = TextProcessor(chunk_size=50, chunk_overlap=10)
+    builder = ChunkBuilder("doc.pdf", 50, 10)
+    chunks = []
+    for piece in clean_pages(pages):
+        chunks.extend(builder.feed(piece))
+    chunks.extend(builder.finalize())
+    assert chunks == processor.create_chunks(full_text, "doc.pdf"), "Streamed chunks should match create_chunks"
+    print("✅ Streaming chunk builder works")
+    return True
+
+def test_txt_files_match_process_text():
+    """Test that process_txt on ASCII, CRLF, UTF-8 and latin-1 files matches process_text"""
+    print("🧪 Testing TXT file processing...")
+
+    import tempfile
+    from src.pdf_processor import TXTProcessor
+
+    ascii_text = TEST_CONTENT
+    unicode_text = TEST_CONTENT.replace("Introduction", "Café résumé — naïve")
+    cases = [
+        # (file name, bytes on disk, text expected after decoding, encoding)
+        ("ascii.txt", ascii_text.encode("ascii"), ascii_text, "utf-8"),
+        ("crlf.txt", ascii_text.replace("\n", "\r\n").encode("ascii"), ascii_text, "utf-8"),
+        ("utf8.txt", unicode_text.encode("utf-8"), unicode_text, "utf-8"),
+        ("latin1.txt", "Café au lait\r\n".encode("latin-1") * 30, "Café au lait\n" * 30, "latin-1"),
+    ]
+
+    processor = TXTProcessor(chunk_size=200, chunk_overlap=50)
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, data, text, encoding in cases:
+            path = Path(tmp) / name
+            path.write_bytes(data)
+            chunks = processor.process_txt(path)
+
+            expected = processor.process_text(text, name)
+            for chunk in expected:
+                chunk["metadata"]["encoding"] = encoding
+            assert chunks == expected, f"{name}: chunks should match process_text"
+            assert all(c["metadata"]["total_chars"] == len(text) for c in chunks), f"{name}: wrong total_chars"
+            print(f"   ✅ {name}: {len(chunks)} chunks, {encoding}")
+
+    print("✅ TXT file processing matches in-memory chunking")
+    return True
+
+def _write_pdf(path, lines):
+    """Write a one-page PDF with one line of Helvetica text per entry in lines"""
+    content = "BT /F1 12 Tf 14 TL 72 720 Td " + " T* ".join(f"({line}) Tj" for line in lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R"
+        " /Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(content)} >>\nstream\n{content}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n{obj}\nendobj\n".encode()
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    data += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    Path(path).write_bytes(bytes(data))
+
+def test_pdf_backends_match():
+    """Test that PDFium and PyPDF2 extraction produce the same chunks"""
+    print("🧪 Testing PDF extraction backends...")
+
+    import tempfile
+    import src.pdf_processor as pdf_processor
+
+    if not pdf_processor.PDFIUM_AVAILABLE:
+        print("⚠️  pypdfium2 not installed, skipping")
+        return True
+
+    lines = ["Sample Test PDF", "This is a sample PDF generated for testing", "the PDF processor in the RAG app."]
+    processor = pdf_processor.PDFProcessor(chunk_size=40, chunk_overlap=10)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "sample.pdf"
+        _write_pdf(path, lines)
+        try:
+            pdfium_chunks = processor.process_pdf(path)
+            pdf_processor.PDFIUM_AVAILABLE = False
+            pypdf_chunks = processor.process_pdf(path)
+        finally:
+            pdf_processor.PDFIUM_AVAILABLE = True
+
+    assert "\r" not in "".join(c["page_content"] for c in pdfium_chunks), "PDFium line breaks should be \\n"
+    assert pdfium_chunks == pypdf_chunks, "PDFium and PyPDF2 chunks should match"
+    print("✅ PDF extraction backends match")
+    return True
 
 def demonstrate_recommendations():
     """Demonstrate the recommendation system"""
@@ -127,6 +231,10 @@ def main():
     
     try:
         test_chunking_configurations()
+        test_text_cleaning()
+        test_streaming_chunks()
+        test_txt_files_match_process_text()
+        test_pdf_backends_match()
         demonstrate_recommendations()
         
         print("\n" + "=" * 60)
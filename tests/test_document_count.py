@@ -4,8 +4,6 @@ Test script to verify document counting works correctly
 """
 
 import sys
-import tempfile
-import os
 from pathlib import Path
 
 # Add the current directory to Python path
@@ -25,15 +23,10 @@ def test_document_counting():
     # Create test content that will be chunked
     long_text = "This is a test document. " * 100  # Long enough to create multiple chunks
     
-    # Create a temporary text file
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as tmp_file:
-        tmp_file.write(long_text)
-        tmp_path = tmp_file.name
-    
     try:
-        # Process the file
+        # Chunk the text straight from memory
         processor = TXTProcessor(chunk_size=200, chunk_overlap=50)  # Small chunks to force multiple
-        documents = processor.process_txt(tmp_path)
+        documents = processor.process_text(long_text, "test_document.txt")
         
         print(f"📄 Created {len(documents)} chunks from 1 file")
         
@@ -58,10 +51,6 @@ def test_document_counting():
             return False
             
     finally:
-        # Clean up
-        if os.path.exists(tmp_path):
-            os.unlink(tmp_path)
-        
         # Reset vector store
         try:
             vector_store.reset_collection()
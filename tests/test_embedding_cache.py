@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the memory-mapped embedding cache
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.append('.')
+
+def test_cache_roundtrip():
+    """Test storing, reading and overwriting cached embeddings"""
+    print("🧪 Testing embedding cache roundtrip...")
+
+    from src.embeddings import CacheStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CacheStore(Path(tmp))
+        assert store.get("missing") is None, "Unknown keys should miss"
+
+        store.put("a", [0.5, 0.25, 1.0])
+        store.put("b", [1.0, 2.0, 3.0])
+        assert store.get("a") == [0.5, 0.25, 1.0], "Stored vector should round-trip"
+
+        store.put("a", [4.0, 5.0, 6.0])
+        assert store.get("a") == [4.0, 5.0, 6.0], "Re-putting a key should overwrite it"
+        assert store.stats()["entries"] == 2, "Overwrite shouldn't add an entry"
+
+        store.put("c", [1.0, 2.0])
+        assert store.get("c") is None, "Vectors of another dimension should be skipped"
+        store.close()
+    print("✅ Embedding cache roundtrip works")
+
+def test_cache_growth_and_reopen():
+    """Test that the matrix grows past its initial capacity and persists"""
+    print("🧪 Testing embedding cache growth...")
+
+    from src.embeddings import CacheStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CacheStore(Path(tmp))
+        count = CacheStore.INITIAL_CAPACITY + 10
+        for i in range(count):
+            store.put(f"k{i}", [float(i), float(i) + 0.5])
+        store.close()
+
+        reopened = CacheStore(Path(tmp))
+        assert reopened.stats()["entries"] == count, "All entries should persist"
+        assert reopened.get(f"k{count - 1}") == [count - 1.0, count - 0.5], "Last row should persist"
+
+        reopened.clear()
+        assert reopened.get("k0") is None, "Cleared cache should miss"
+        reopened.put("x", [1.0, 2.0, 3.0])
+        assert reopened.get("x") == [1.0, 2.0, 3.0], "Cleared cache should accept a new dimension"
+        reopened.close()
+    print("✅ Embedding cache growth works")
+
+def test_cache_key_scheme_change():
+    """Test that a cache built with another key hash is discarded"""
+    print("🧪 Testing embedding cache key scheme...")
+
+    from src.embeddings import CacheStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CacheStore(Path(tmp), key_scheme="md5")
+        store.put("a", [1.0, 2.0])
+        store.close()
+
+        same = CacheStore(Path(tmp), key_scheme="md5")
+        assert same.get("a") == [1.0, 2.0], "Same scheme should keep entries"
+        same.close()
+
+        other = CacheStore(Path(tmp), key_scheme="xxh3_128")
+        assert other.get("a") is None, "Different scheme should invalidate the cache"
+        other.close()
+    print("✅ Embedding cache key scheme works")
+
+def test_cache_async_writes():
+    """Test that queued writes are visible at once and persist after flushing"""
+    print("🧪 Testing background cache writes...")
+
+    from src.embeddings import CacheStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CacheStore(Path(tmp))
+        for i in range(300):
+            store.put_async(f"k{i}", [float(i), 1.0])
+        assert store.get("k299") == [299.0, 1.0], "Queued write should be readable immediately"
+
+        store.flush()
+        assert store.stats()["entries"] == 300, "Flushed writes should all be indexed"
+        store.close()
+
+        reopened = CacheStore(Path(tmp))
+        assert reopened.get("k0") == [0.0, 1.0], "Flushed writes should persist"
+        reopened.close()
+    print("✅ Background cache writes work")
+
+def main():
+    """Run all tests"""
+    print("🚀 Running embedding cache tests...\n")
+
+    try:
+        test_cache_roundtrip()
+        print()
+
+        test_cache_growth_and_reopen()
+        print()
+
+        test_cache_key_scheme_change()
+        print()
+
+        test_cache_async_writes()
+        print()
+
+        print("🎉 All embedding cache tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -3,71 +3,165 @@
 Test script to verify RAG application setup
 """
 
+import argparse
+import importlib
+import importlib.util
 import sys
 import time
 import shutil
 import os
+import pickle
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
 from pathlib import Path
 
-# Terminal color codes
-GREEN = "\033[92m"
-RED = "\033[91m"
-YELLOW = "\033[93m"
-CYAN = "\033[96m"
-RESET = "\033[0m"
+# Terminal color codes, left out when output is redirected
+if sys.stdout.isatty():
+    GREEN = "\033[92m"
+    RED = "\033[91m"
+    YELLOW = "\033[93m"
+    CYAN = "\033[96m"
+    RESET = "\033[0m"
+else:
+    GREEN = RED = YELLOW = CYAN = RESET = ""
+
+# Working directory, resolved once; the setup paths below are relative to it
+_CWD = os.getcwd()
+
+def _abs(path):
+    """Absolute form of a path relative to the repo root."""
+    return _CWD if path == "." else os.path.join(_CWD, path)
+
+# Per-thread output buffer, set while a test runs on a worker thread
+_output = threading.local()
+
+# Main-thread output waiting for the next _flush(), written in one call
+_stdout_lines = []
 
 def print_colored(msg, color):
-    print(color + msg + RESET)
+    buffer = getattr(_output, "buffer", None)
+    (_stdout_lines if buffer is None else buffer).append(f"{color}{msg}{RESET}\n")
+
+def _flush():
+    """Write the buffered output with a single write and flush."""
+    sys.stdout.write("".join(_stdout_lines))
+    sys.stdout.flush()
+    _stdout_lines.clear()
+
+def _remove_pycache(path):
+    """Delete a __pycache__ folder; its entries are plain .pyc files, so skip rmtree's checks."""
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path, ignore_errors=True)  # Not written by Python
+                else:
+                    os.unlink(entry.path)
+        os.rmdir(path)
+    except OSError:
+        pass
+
+def _clear_entry(entry):
+    """Delete entry if it is a cache, or the caches under it, yielding each removed path."""
+    if entry.is_dir(follow_symlinks=False):
+        if entry.name == "__pycache__":
+            _remove_pycache(entry.path)
+            yield entry.path
+        else:
+            yield from _walk_fast(entry.path)
+    elif entry.name.endswith(".pyc") and entry.is_file(follow_symlinks=False):
+        os.remove(entry.path)
+        yield entry.path
+
+def _walk_fast(root):
+    """Delete __pycache__ folders and .pyc files under root, yielding each removed path."""
+    with os.scandir(root) as it:
+        for entry in it:
+            yield from _clear_entry(entry)
 
 def clear_cache_files(root="."):
     """Remove __pycache__ folders and .pyc files recursively from root."""
     print_colored("🧹 Clearing cache files...", CYAN)
+    with os.scandir(_abs(root)) as it:
+        entries = list(it)
     removed = 0
-    for dirpath, dirnames, filenames in os.walk(root):
-        # Remove __pycache__ directories
-        if "__pycache__" in dirnames:
-            shutil.rmtree(os.path.join(dirpath, "__pycache__"))
-            print_colored(f"  Removed: {os.path.join(dirpath, '__pycache__')}", YELLOW)
-            removed += 1
-        # Remove .pyc files
-        for filename in filenames:
-            if filename.endswith(".pyc"):
-                filepath = os.path.join(dirpath, filename)
-                os.remove(filepath)
-                print_colored(f"  Removed: {filepath}", YELLOW)
+    # Top-level subtrees are cleaned in parallel; the deletes release the GIL
+    with ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 1) * 2)) as executor:
+        for paths in executor.map(lambda entry: list(_clear_entry(entry)), entries):
+            for path in paths:
+                print_colored(f"  Removed: {path}", YELLOW)
                 removed += 1
     print_colored(f"✅ Cache cleanup complete. {removed} items removed.\n", GREEN)
+    _flush()
+
+# (module, label) checked by test_imports. Only their availability is checked
+# there; each test imports what it uses on first run (then from sys.modules),
+# so test_files and test_directories run without loading the ML stack at all
+MODULES = (
+    ("config", "config module"),
+    ("src.pdf_processor", "PDF processor"),
+    ("src.embeddings", "Ollama embeddings"),
+    ("src.vector_store", "Vector store"),
+    ("src.retrieval_qa", "RAG chatbot"),
+    ("src.utils", "Utilities"),
+)
+
+# Modules found missing, with the reason; never looked up again in this process
+_failed_imports = {}
+
+def _find_spec(module):
+    """importlib.util.find_spec, with a missing parent package reported as None too."""
+    try:
+        return importlib.util.find_spec(module)
+    except ModuleNotFoundError:
+        return None
+
+# Ollama status for the rest of the run, refreshed after OLLAMA_STATUS_TTL seconds
+OLLAMA_STATUS_TTL = 30
+_ollama_status = None  # (timestamp, status)
+_ollama_status_lock = threading.Lock()
+
+def _status():
+    """check_ollama_status(), asked once and shared by every test that needs it."""
+    global _ollama_status
+    from src.utils import check_ollama_status
+    with _ollama_status_lock:
+        if _ollama_status is None or time.monotonic() - _ollama_status[0] > OLLAMA_STATUS_TTL:
+            _ollama_status = (time.monotonic(), check_ollama_status())
+        return _ollama_status[1]
 
 def test_imports():
     print_colored("🔍 Testing module imports...", CYAN)
-    try:
-        import config
-        print_colored("✅ config module", GREEN)
-        from src.pdf_processor import PDFProcessor
-        print_colored("✅ PDF processor", GREEN)
-        from src.embeddings import EmbeddingManager
-        print_colored("✅ Ollama embeddings", GREEN)
-        from src.vector_store import ChromaVectorStore
-        print_colored("✅ Vector store", GREEN)
-        from src.retrieval_qa import RAGChatbot
-        print_colored("✅ RAG chatbot", GREEN)
-        from src.utils import check_ollama_status
-        print_colored("✅ Utilities", GREEN)
-        return True
-    except ImportError as e:
-        print_colored(f"❌ Import error: {e}", RED)
-        return False
+    for module, label in MODULES:
+        # A missing module is a None spec, not an ImportError to unwind; a found
+        # one is still imported, so syntax errors and broken dependencies show up
+        if module not in _failed_imports:
+            if _find_spec(module) is None:
+                _failed_imports[module] = f"No module named '{module}'"
+            else:
+                try:
+                    importlib.import_module(module)
+                except Exception as e:
+                    _failed_imports[module] = str(e) or type(e).__name__
+        error = _failed_imports.get(module)
+        if error is None:
+            print_colored(f"✅ {label}", GREEN)
+        else:
+            print_colored(f"❌ {label}: {error}", RED)
+    if _failed_imports:
+        print_colored("   Failed imports: " + ", ".join(_failed_imports), YELLOW)
+    return not _failed_imports
 
 def test_ollama_connection():
     print_colored("\n🔍 Testing Ollama connection...", CYAN)
     try:
-        from src.utils import check_ollama_status
-        status = check_ollama_status()
+        status = _status()
         if status['status'] == 'running':
             print_colored("✅ Ollama is running", GREEN)
-            print_colored(f"   Available models: {len(status.get('available_models', []))}", YELLOW)
+            models = set(status.get('available_models', []))
+            print_colored(f"   Available models: {len(models)}", YELLOW)
             # Check specific models
-            models = status.get('available_models', [])
             for model in ['llama3.1:latest', 'nomic-embed-text']:
                 if model in models:
                     print_colored(f"✅ {model} model available", GREEN)
@@ -128,36 +222,141 @@ def test_pdf_processor():
         print_colored(f"❌ Error testing PDF processor: {e}", RED)
         return False
 
+# Paths the setup must have, relative to the repo root
+DIRECTORIES = ("data/uploads", "chroma_db", "src")
+FILES = (
+    "requirements.txt", "config.py", "app.py",
+    "src/__init__.py", "src/pdf_processor.py", "src/embeddings.py",
+    "src/vector_store.py", "src/retrieval_qa.py", "src/utils.py"
+)
+
+@lru_cache(maxsize=1)
+def _repo_manifest():
+    """
+    Every entry of the parent directories of FILES and DIRECTORIES, as a
+    {relative path: is_dir} dict. Each parent is listed once per run, for both tests.
+    """
+    manifest = {}
+    for parent in dict.fromkeys(os.path.dirname(path) or "." for path in DIRECTORIES + FILES):
+        try:
+            with os.scandir(_abs(parent)) as it:
+                for entry in it:
+                    path = entry.name if parent == "." else f"{parent}/{entry.name}"
+                    manifest[path] = entry.is_dir()
+        except OSError:
+            pass
+    return manifest
+
+def _report_paths(paths, missing):
+    """Print one result line per path, in order; True when none are missing."""
+    for path in paths:
+        if path in missing:
+            print_colored(f"❌ {path} missing", RED)
+        else:
+            print_colored(f"✅ {path}", GREEN)
+    return not missing
+
 def test_directories():
     print_colored("\n🔍 Testing directories...", CYAN)
-    directories = ["data/uploads", "chroma_db", "src"]
-    all_ok = True
-    for directory in directories:
-        if Path(directory).exists():
-            print_colored(f"✅ {directory}", GREEN)
-        else:
-            print_colored(f"❌ {directory} missing", RED)
-            all_ok = False
-    return all_ok
+    manifest = _repo_manifest()
+    missing = {directory for directory in DIRECTORIES if not manifest.get(directory)}
+    return _report_paths(DIRECTORIES, missing)
 
 def test_files():
     print_colored("\n🔍 Testing files...", CYAN)
-    files = [
-        "requirements.txt", "config.py", "app.py",
-        "src/__init__.py", "src/pdf_processor.py", "src/embeddings.py",
-        "src/vector_store.py", "src/retrieval_qa.py", "src/utils.py"
-    ]
-    all_ok = True
-    for file_path in files:
-        if Path(file_path).exists():
-            print_colored(f"✅ {file_path}", GREEN)
-        else:
-            print_colored(f"❌ {file_path} missing", RED)
-            all_ok = False
-    return all_ok
+    missing = set(FILES) - _repo_manifest().keys()
+    return _report_paths(FILES, missing)
 
-def main():
-    clear_cache_files(".")  # Clean cache files before running tests
+def _run_test(test_func):
+    """Run one test with its output buffered; returns (passed, error, output lines, seconds)."""
+    _output.buffer = []
+    start = time.perf_counter()
+    try:
+        return bool(test_func()), None, _output.buffer, time.perf_counter() - start
+    except Exception as e:
+        return False, e, _output.buffer, time.perf_counter() - start
+    finally:
+        _output.buffer = None
+
+# Files and directories each result depends on. Only tests that check the tree itself
+# are cached: the others also depend on installed packages, every src module they
+# import and services like Ollama, none of which a fingerprint of local paths covers
+TEST_DEPENDENCIES = {
+    "Files": (".", "src"),
+    "Directories": (".", "data"),
+}
+
+RESULTS_CACHE = Path.home() / ".cache" / "rag_setup_test" / "results.pkl"
+
+def _fingerprint(test_name):
+    """
+    Interpreter plus the state of a test's dependencies, or None if one is missing:
+    (mtime_ns, size) for files, entry names for directories. Directory mtimes would
+    change whenever Python writes or this script clears a __pycache__ folder.
+    """
+    state = []
+    for path in TEST_DEPENDENCIES[test_name]:
+        try:
+            full_path = _abs(path)
+            if os.path.isdir(full_path):
+                with os.scandir(full_path) as it:
+                    names = frozenset(e.name for e in it if e.name != "__pycache__" and not e.name.endswith(".pyc"))
+                state.append((path, names))
+            else:
+                st = os.stat(full_path)
+                state.append((path, st.st_mtime_ns, st.st_size))
+        except OSError:
+            return None
+    return (sys.executable, tuple(state))
+
+def _load_results():
+    """Passing results from earlier runs: {(cwd, test name): (fingerprint, seconds)}."""
+    try:
+        with open(RESULTS_CACHE, "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        return {}
+
+def _save_results(cache):
+    try:
+        RESULTS_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = RESULTS_CACHE.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(cache, f)
+        os.replace(tmp_path, RESULTS_CACHE)
+    except OSError:
+        pass
+
+# (name, test, names of the tests it needs to have passed), in report order
+TESTS = (
+    ("Files", test_files, ()),
+    ("Directories", test_directories, ()),
+    ("Imports", test_imports, ("Files",)),
+    ("PDF Processor", test_pdf_processor, ("Imports",)),
+    ("Ollama Connection", test_ollama_connection, ("Imports",)),
+    ("Embeddings", test_embeddings, ("Ollama Connection",)),
+    ("Vector Store", test_vector_store, ("Imports",)),
+)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Verify the RAG application setup.")
+    parser.add_argument(
+        "--clean", action="store_true",
+        help="Always clear __pycache__ folders and .pyc files first. By default this is "
+             "skipped under python -B, which writes no bytecode, or with SKIP_CACHE_CLEAN=1 "
+             "(e.g. throwaway CI containers)."
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="Rerun every test, even those that passed last time and whose files haven't changed."
+    )
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Clean cache files before running tests, unless no bytecode is being written
+    if args.clean or not (os.environ.get("SKIP_CACHE_CLEAN") or sys.dont_write_bytecode):
+        clear_cache_files(".")
 
     print_colored("""
 ╔══════════════════════════════════════╗
@@ -165,30 +364,65 @@ def main():
 ╚══════════════════════════════════════╝
 """, CYAN)
 
-    tests = [
-        ("Files", test_files),
-        ("Directories", test_directories),
-        ("Imports", test_imports),
-        ("PDF Processor", test_pdf_processor),
-        ("Ollama Connection", test_ollama_connection),
-        ("Embeddings", test_embeddings),
-        ("Vector Store", test_vector_store),
-    ]
-    passed = 0
-    total = len(tests)
-    failed_tests = []
+    total = len(TESTS)
 
     t0 = time.time()
-    for test_name, test_func in tests:
-        try:
-            if test_func():
-                passed += 1
-            else:
-                print_colored(f"❌ {test_name} test failed", RED)
-                failed_tests.append(test_name)
-        except Exception as e:
-            print_colored(f"❌ {test_name} test error: {e}", RED)
-            failed_tests.append(test_name)
+    cwd = _CWD
+    cache = {} if args.force else _load_results()
+    fingerprints = {name: _fingerprint(name) for name in TEST_DEPENDENCIES}
+    results = {}  # Test name -> True (passed), False (failed) or None (skipped)
+
+    # Skip tests that passed before against the same files
+    pending = []
+    for test_name, test_func, deps in TESTS:
+        cached = cache.get((cwd, test_name))
+        fingerprint = fingerprints.get(test_name)
+        if fingerprint is not None and cached is not None and cached[0] == fingerprint:
+            print_colored(f"⏭️  {test_name}: unchanged since it last passed ({cached[1]:.2f}s, cached)", GREEN)
+            results[test_name] = True
+        else:
+            pending.append((test_name, test_func, deps))
+    _flush()
+
+    # Tests mostly wait on I/O, so each one starts as soon as the tests it needs have
+    # passed, and is skipped once one of them hasn't; output is printed per test
+    with ThreadPoolExecutor(max_workers=max(len(pending), 1)) as executor:
+        running = {}
+        while pending or running:
+            for entry in list(pending):
+                test_name, test_func, deps = entry
+                blocked = [dep for dep in deps if dep in results and results[dep] is not True]
+                if blocked:
+                    print_colored(f"⏭️  {test_name} test skipped: needs {', '.join(blocked)}", YELLOW)
+                    results[test_name] = None
+                    pending.remove(entry)
+                elif all(dep in results for dep in deps):
+                    running[executor.submit(_run_test, test_func)] = test_name
+                    pending.remove(entry)
+            _flush()
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                test_name = running.pop(future)
+                ok, error, lines, seconds = future.result()
+                _stdout_lines.extend(lines)
+                if error is not None:
+                    print_colored(f"❌ {test_name} test error: {error}", RED)
+                elif not ok:
+                    print_colored(f"❌ {test_name} test failed", RED)
+                _flush()
+                results[test_name] = ok
+                if fingerprints.get(test_name) is not None:
+                    if ok:
+                        cache[(cwd, test_name)] = (fingerprints[test_name], seconds)
+                    else:
+                        cache.pop((cwd, test_name), None)
+    _save_results(cache)
+
+    passed = sum(1 for ok in results.values() if ok)
+    failed_tests = [test_name for test_name, _, _ in TESTS if results[test_name] is False]
+    skipped_tests = [test_name for test_name, _, _ in TESTS if results[test_name] is None]
 
     print_colored("\n" + "=" * 40, CYAN)
     print_colored(f"📊 Test Results: {passed}/{total} tests passed", GREEN if passed == total else RED)
@@ -202,9 +436,12 @@ def main():
         print_colored("⚠️  Some tests failed. Please check the setup.", RED)
         if failed_tests:
             print_colored("❌ Failed tests: " + ', '.join(failed_tests), YELLOW)
+        if skipped_tests:
+            print_colored("⏭️  Skipped tests: " + ', '.join(skipped_tests), YELLOW)
         if passed < 3:  # Critical failures
             print_colored("❌ Critical setup issues detected.", RED)
             print_colored("Please run: python setup.py", YELLOW)
+    _flush()
 
     return passed == total
 
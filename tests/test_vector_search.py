@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the in-memory vectorized similarity search
+"""
+
+import sys
+import numpy as np
+
+# Add the current directory to Python path
+sys.path.append('.')
+
+def test_dense_index_topk():
+    """Test that DenseIndex returns the same top-K as a brute-force cosine ranking"""
+    print("🧪 Testing dense index top-K...")
+
+    from src.vector_store import DenseIndex
+
+    rng = np.random.default_rng(42)
+    embeddings = rng.random((200, 32))
+    texts = [f"chunk {i}" for i in range(len(embeddings))]
+
+    index = DenseIndex()
+    # Add in two blocks to exercise consolidation
+    index.add(embeddings[:120], texts[:120], [{"chunk_id": i} for i in range(120)])
+    index.add(embeddings[120:], texts[120:], [{"chunk_id": i} for i in range(120, 200)])
+    assert len(index) == 200, "Index should hold every added vector"
+
+    query = rng.random(32)
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    expected = np.argsort(-(normalized @ query))[:5].tolist()
+
+    assert index.search(query, 5) == expected, "Top-K should match brute-force ranking"
+    assert len(index.search(query, 1000)) == 200, "k larger than the index should return everything"
+    print("✅ Dense index top-K matches brute force")
+
+def test_dense_index_quantized():
+    """Test that the INT8 index is 4x smaller and keeps the top results"""
+    print("🧪 Testing quantized dense index...")
+
+    from src.vector_store import DenseIndex
+
+    rng = np.random.default_rng(7)
+    embeddings = rng.standard_normal((500, 64))
+    texts = [f"chunk {i}" for i in range(len(embeddings))]
+
+    full = DenseIndex()
+    full.add(embeddings, texts, [{}] * len(texts))
+    quantized = DenseIndex(quantize=True)
+    quantized.add(embeddings, texts, [{}] * len(texts))
+
+    query = rng.standard_normal(64)
+    expected = set(full.search(query, 10))
+    overlap = len(expected & set(quantized.search(query, 10)))
+
+    assert quantized._matrix.dtype == np.int8, "Quantized matrix should be INT8"
+    assert quantized._matrix.nbytes * 4 == full._matrix.nbytes, "INT8 matrix should be 4x smaller"
+    assert overlap >= 9, f"Quantized search should keep the top results, got {overlap}/10"
+    print(f"✅ Quantized index recall@10: {overlap}/10")
+
+def test_dense_index_half():
+    """Test that the FP16 index is 2x smaller and keeps the top results, with and without SIMD"""
+    print("🧪 Testing half-precision dense index...")
+
+    import src.vector_store as vector_store
+    from src.vector_store import DenseIndex
+
+    rng = np.random.default_rng(11)
+    embeddings = rng.standard_normal((500, 64))
+    texts = [f"chunk {i}" for i in range(len(embeddings))]
+
+    full = DenseIndex()
+    full.add(embeddings, texts, [{}] * len(texts))
+    half = DenseIndex(half=True)
+    half.add(embeddings, texts, [{}] * len(texts))
+
+    query = rng.standard_normal(64)
+    expected = set(full.search(query, 10))
+
+    simd = vector_store.SIMSIMD_AVAILABLE
+    try:
+        for available in {simd, False}:
+            vector_store.SIMSIMD_AVAILABLE = available
+            overlap = len(expected & set(half.search(query, 10)))
+            assert overlap >= 9, f"FP16 search should keep the top results, got {overlap}/10"
+    finally:
+        vector_store.SIMSIMD_AVAILABLE = simd
+
+    assert half._matrix.dtype == np.float16, "Half-precision matrix should be FP16"
+    assert half._matrix.nbytes * 2 == full._matrix.nbytes, "FP16 matrix should be 2x smaller"
+    print(f"✅ Half-precision index recall@10: {overlap}/10")
+
+def test_dense_index_search_many():
+    """Test that batched search returns the same hits as one search per query"""
+    print("🧪 Testing batched dense index search...")
+
+    from src.vector_store import DenseIndex
+
+    rng = np.random.default_rng(5)
+    embeddings = rng.random((300, 16))
+    index = DenseIndex()
+    index.add(embeddings, [f"chunk {i}" for i in range(300)], [{}] * 300)
+
+    queries = rng.random((4, 16))
+    queries[2] = 0  # A zero query matches nothing
+    expected = [index.search(query, 5) for query in queries]
+
+    assert index.search_many(queries, 5) == expected, "Batched results should match single searches"
+    assert expected[2] == [], "Zero query should return no results"
+    print("✅ Batched dense index search matches single searches")
+
+def test_fast_topk():
+    """Test that the top-K selector agrees with a full sort"""
+    print("🧪 Testing top-K selection...")
+
+    from src.fast_topk import topk
+
+    rng = np.random.default_rng(3)
+    for n, k in [(1000, 10), (5, 10), (50, 0)]:
+        for dtype in (np.float32, np.float64):
+            scores = rng.random(n).astype(dtype)
+            expected = np.argsort(-scores)[:k].tolist()
+            assert topk(scores, k).tolist() == expected, f"Top-K mismatch for n={n}, k={k}"
+    print("✅ Top-K selection matches full sort")
+
+def test_compute_mmr():
+    """Test that MMR skips near-duplicates and agrees with the NumPy fallback"""
+    print("🧪 Testing MMR selection...")
+
+    from src.fast_topk import compute_mmr, _mmr_numpy
+
+    # Candidate 1 duplicates the best match 0; candidate 2 is less relevant but distinct
+    vectors = np.array([[1.0, 0.0], [1.0, 0.0], [0.6, 0.8]])
+    sim_qd = vectors @ np.array([1.0, 0.1]) / np.linalg.norm([1.0, 0.1])
+    sim_dd = vectors @ vectors.T
+    assert compute_mmr(sim_qd, sim_dd, 2, 0.5).tolist() == [0, 2], "MMR should skip the duplicate"
+    assert compute_mmr(sim_qd, sim_dd, 2, 1.0).tolist() == [0, 1], "lambda=1 should rank by relevance"
+
+    rng = np.random.default_rng(9)
+    embeddings = rng.standard_normal((200, 16))
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    sim_qd = embeddings @ embeddings[0]
+    sim_dd = embeddings @ embeddings.T
+    expected = _mmr_numpy(sim_qd, sim_dd, 10, 0.5).tolist()
+    assert compute_mmr(sim_qd, sim_dd, 10, 0.5).tolist() == expected, "MMR should match the fallback"
+    print("✅ MMR selection works")
+
+def test_dense_index_empty():
+    """Test that an empty index returns no results"""
+    print("🧪 Testing empty dense index...")
+
+    from src.vector_store import DenseIndex
+
+    index = DenseIndex()
+    assert index.search(np.ones(8), 4) == [], "Empty index should return no results"
+    print("✅ Empty dense index works")
+
+def test_search_cache_after_failed_add():
+    """Test that batches stored before a failed add are visible to cached searches"""
+    print("🧪 Testing search cache after a partial add...")
+
+    import shutil
+    import tempfile
+    from src.vector_store import ChromaVectorStore
+
+    class OneHotProvider:
+        """'doc n' embeds to the n-th unit vector; fails for n >= fail_from"""
+        fail_from = None
+
+        def embed_text(self, texts):
+            numbers = [int(text.split()[-1]) for text in texts]
+            if self.fail_from is not None and max(numbers) >= self.fail_from:
+                raise RuntimeError("embedding service unavailable")
+            return np.eye(32, dtype=np.float32)[numbers]
+
+    def docs(numbers):
+        return [{"page_content": f"doc {n}", "metadata": {"source": "test.txt", "chunk_id": n}} for n in numbers]
+
+    persist_directory = tempfile.mkdtemp()
+    try:
+        store = ChromaVectorStore(persist_directory=persist_directory, embedding_provider="ollama")
+        provider = store._embedding_provider = OneHotProvider()
+        store.add_documents(docs(range(10)))
+        assert store.collection.count() == 10, "Initial documents should be stored"
+
+        before = store.similarity_search("doc 12", k=1)
+        assert [d["page_content"] for d in before] != ["doc 12"], "doc 12 isn't stored yet"
+
+        # The first batch (10-14) is committed before the second one fails to embed
+        provider.fail_from = 15
+        try:
+            store.add_documents(docs(range(10, 20)), batch_size=5)
+            raise AssertionError("add_documents should re-raise the embedding error")
+        except RuntimeError:
+            pass
+        assert store.collection.count() == 15, "The batch before the failure should stay committed"
+
+        after = store.similarity_search("doc 12", k=1)
+        assert [d["page_content"] for d in after] == ["doc 12"], "Cached results should be invalidated"
+        assert store.get_collection_info()["document_count"] == 15, "Collection info should see the batch"
+
+        # Hits are copies: editing one must not change the next hit
+        after[0]["metadata"]["chunk_id"] = -1
+        assert store.similarity_search("doc 12", k=1)[0]["metadata"]["chunk_id"] == 12, \
+            "Cached results should not be shared with callers"
+    finally:
+        shutil.rmtree(persist_directory, ignore_errors=True)
+    print("✅ Search cache is invalidated after a partial add")
+
+def main():
+    """Run all tests"""
+    print("🚀 Running vector search tests...\n")
+
+    try:
+        test_dense_index_topk()
+        print()
+
+        test_dense_index_quantized()
+        print()
+
+        test_dense_index_half()
+        print()
+
+        test_dense_index_search_many()
+        print()
+
+        test_fast_topk()
+        print()
+
+        test_compute_mmr()
+        print()
+
+        test_dense_index_empty()
+        print()
+
+        test_search_cache_after_failed_add()
+        print()
+
+        print("🎉 All vector search tests passed!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)